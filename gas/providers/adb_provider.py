@@ -4,12 +4,18 @@ import platform
 import subprocess
 import shutil
 import os
+import threading
 import time
-from typing import Optional, Tuple, List, Dict, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import cv2
 import numpy as np
 import re
 
+try:
+    from turbojpeg import TurboJPEG
+except ImportError:  # 未安装 PyTurboJPEG 时不使用 JPEG 截图
+    TurboJPEG = None
+
 from gas.cons.key_code import KeyCode, get_android_keycode
 from gas.interfaces.interfaces import IDeviceProvider
 from gas.logger import get_logger
@@ -127,6 +133,141 @@ def _find_adb_path() -> str:
     return "adb"
 
 
+_SENTINEL = "__GAS_OK__"
+_SENTINEL_BYTES = _SENTINEL.encode()
+
+
+class _AdbShell:
+    """
+    常驻的 adb shell 进程：命令写入 stdin，结果从 stdout 读取，省去每次调用 fork/exec adb 的开销
+    stdin 为管道时 adb 不分配 pty，stdout 按原始字节传输，可以直接读取二进制数据
+    """
+
+    # 单次读取的默认超时（秒），与原先 subprocess.run 的 timeout 一致
+    READ_TIMEOUT = 10.0
+
+    def __init__(self, adb_path: str, device_id: Optional[str]):
+        cmd = [adb_path]
+        if device_id:
+            cmd += ["-s", device_id]
+        cmd.append("shell")
+        self.lock = threading.Lock()
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+        # Windows 管道不支持 select，stdout 由后台线程读入缓冲区，读取方在 Condition 上带超时等待
+        self._buf = bytearray()
+        self._eof = False
+        self._cond = threading.Condition()
+        threading.Thread(target=self._read_loop, name="adb-shell-reader", daemon=True).start()
+
+    def _read_loop(self):
+        read = self._proc.stdout.read1
+        while True:
+            try:
+                chunk = read(1 << 20)
+            except (OSError, ValueError):
+                chunk = b""
+            with self._cond:
+                if not chunk:
+                    self._eof = True
+                    self._cond.notify_all()
+                    return
+                self._buf += chunk
+                self._cond.notify_all()
+
+    def _wait(self, ready: Callable[[], bool], timeout: Optional[float]):
+        """等待缓冲区满足 ready()（调用方需持有 self._cond），超时抛出 TimeoutError，进程退出抛出 EOFError"""
+        if not self._cond.wait_for(lambda: ready() or self._eof, timeout):
+            raise TimeoutError(f"adb shell 在 {timeout} 秒内没有输出")
+        if not ready():
+            raise EOFError("adb shell 已退出")
+
+    @property
+    def alive(self) -> bool:
+        return self._proc.poll() is None
+
+    def write(self, command: str):
+        """写入一行命令（调用方需持有 self.lock）"""
+        self._proc.stdin.write(command.encode("utf-8") + b"\n")
+        self._proc.stdin.flush()
+
+    def read_exact(self, size: int, timeout: Optional[float] = READ_TIMEOUT) -> bytes:
+        """
+        从 stdout 读取 size 字节（调用方需持有 self.lock）
+        timeout 秒内数据不足抛出 TimeoutError，进程退出导致数据不足时抛出 EOFError
+        """
+        buf = self._buf
+        with self._cond:
+            self._wait(lambda: len(buf) >= size, timeout)
+            data = bytes(buf[:size])
+            del buf[:size]
+        return data
+
+    def readline(self, timeout: Optional[float] = READ_TIMEOUT) -> bytes:
+        """从 stdout 读取一行（包含换行符，调用方需持有 self.lock），超时和进程退出同 read_exact"""
+        buf = self._buf
+        with self._cond:
+            self._wait(lambda: buf.find(b"\n") >= 0, timeout)
+            end = buf.find(b"\n") + 1
+            line = bytes(buf[:end])
+            del buf[:end]
+        return line
+
+    def run(self, command: str, timeout: float = READ_TIMEOUT) -> Tuple[int, str]:
+        """
+        执行一条命令并返回 (退出码, 输出)：命令后追加哨兵行 __GAS_OK__<退出码>，读到哨兵即结束
+        哨兵前额外输出一个换行，保证命令输出末尾没有换行时哨兵也独占一行
+        timeout 秒内没有读到哨兵（命令卡住或在等待 stdin）时抛出 TimeoutError
+        """
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            self.write(f"{command}; printf '\\n{_SENTINEL}%d\\n' $?")
+            lines = []
+            while True:
+                line = self.readline(max(0.0, deadline - time.monotonic()))
+                if line.startswith(_SENTINEL_BYTES):
+                    break
+                lines.append(line)
+        # 去掉哨兵前额外输出的换行
+        output = b"".join(lines)[:-1].decode("utf-8", errors="replace")
+        return int(line[len(_SENTINEL_BYTES) :].strip() or 1), output
+
+    def close(self, kill: bool = False):
+        """关闭 shell；kill=True 用于读取超时等 shell 已卡住的情况，直接结束进程"""
+        if kill:
+            self._proc.kill()
+            return
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self._proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+
+
+# screencap 原始输出的像素格式（android PixelFormat）-> (每像素字节数, 转换到 BGR 的颜色转换码)
+_RAW_FORMATS = {
+    1: (4, cv2.COLOR_RGBA2BGR),  # RGBA_8888
+    2: (4, cv2.COLOR_RGBA2BGR),  # RGBX_8888
+    3: (3, cv2.COLOR_RGB2BGR),  # RGB_888
+    4: (2, cv2.COLOR_BGR5652BGR),  # RGB_565（R 在高位，即 OpenCV 的 BGR565 排列）
+    5: (4, cv2.COLOR_BGRA2BGR),  # BGRA_8888
+}
+
+
+# android KeyEvent.KEYCODE_PASTE
+KEYCODE_PASTE = 279
+# Clipper 剪贴板助手的广播接收器组件
+CLIPPER_RECEIVER = "ca.zgrs.clipper/.ClipperReceiver"
+
+
+def _shell_quote(text: str) -> str:
+    """adb shell 会把参数拼接后交给设备端 sh 再次解析，用单引号包裹保证文本原样传递"""
+    return "'" + text.replace("'", "'\\''") + "'"
+
+
 class ADBProvider(IDeviceProvider):
     def __init__(
         self,
@@ -143,6 +284,21 @@ class ADBProvider(IDeviceProvider):
         self.device_id: Optional[str] = None
         self._screen_size: Optional[Tuple[int, int]] = None
 
+        # 常驻 shell，首次使用时启动；原始截图头长度由系统版本决定，首次截图时确定
+        self._shell: Optional[_AdbShell] = None
+        # 保护常驻 shell 的创建和丢弃，避免多个线程同时启动 shell 或关闭别的线程刚建好的 shell
+        self._shell_lock = threading.Lock()
+        self._raw_header_size: Optional[int] = None
+        self.raw_capture: bool = True
+        # libjpeg-turbo 解码器，仅在原始帧截图不可用时使用 screencap -j（Android 12+）截 JPEG
+        self._tj = self._create_turbojpeg()
+        self.jpeg_capture: bool = self._tj is not None
+        # is_available 成功结果的缓存时间（秒）
+        self.available_ttl: float = 5.0
+        self._available_until = 0.0
+        # 设备是否安装了 Clipper 剪贴板助手，None 表示尚未检测
+        self._clipper_available: Optional[bool] = None
+
         # 用于模拟拖拽的内部状态（链式短 swipe）
         self.is_pressed: bool = False
         self.down_x: Optional[int] = None
@@ -188,6 +344,51 @@ class ADBProvider(IDeviceProvider):
         full_cmd += command
         return subprocess.run(full_cmd, capture_output=True, text=text, timeout=timeout)
 
+    def _get_shell(self) -> _AdbShell:
+        """获取常驻 shell，进程已退出时重新启动"""
+        with self._shell_lock:
+            if self._shell is None or not self._shell.alive:
+                self._shell = _AdbShell(self.adb_path, self.device_id)
+            return self._shell
+
+    def _reset_shell(self, kill: bool = False, shell: Optional[_AdbShell] = None):
+        """
+        常驻 shell 输出错位或进程异常时丢弃，下次使用时重建；kill=True 时直接结束卡住的进程
+        指定 shell 时只在它仍是当前 shell 时丢弃，其他线程已经重建的 shell 不受影响
+        """
+        with self._shell_lock:
+            current = self._shell
+            if current is None or (shell is not None and current is not shell):
+                return
+            self._shell = None
+        # 关闭可能要等待进程退出，放在锁外
+        current.close(kill)
+
+    def close(self):
+        self._reset_shell()
+
+    def _run_shell(self, command: List[str], timeout: float = 10) -> subprocess.CompletedProcess:
+        """
+        在常驻 shell 中执行命令，每次操作只是一次管道写入；常驻 shell 不可用或超时时回退为单独的 adb shell 进程
+        与 adb shell 相同，参数以空格拼接后由设备端 sh 解析
+        """
+        shell = None
+        try:
+            shell = self._get_shell()
+            code, output = shell.run(" ".join(command), timeout)
+            return subprocess.CompletedProcess(command, code, output, "")
+        except TimeoutError as e:
+            # shell 被卡住的命令占用，结束进程后重建，避免后续所有输入都阻塞在锁上
+            logger.warning(f"常驻 shell 执行超时，改用 adb shell: {e}")
+            if shell is not None:
+                self._reset_shell(kill=True, shell=shell)
+            return self._run_adb(["shell", *command], timeout=timeout)
+        except Exception as e:
+            logger.debug(f"常驻 shell 执行失败，改用 adb shell: {e}")
+            if shell is not None:
+                self._reset_shell(shell=shell)
+            return self._run_adb(["shell", *command], timeout=timeout)
+
     def _list_devices(self) -> List[ADBDeviceInfo]:
         try:
             result = subprocess.run([self.adb_path, "devices"], capture_output=True, text=True, timeout=10)
@@ -204,14 +405,104 @@ class ADBProvider(IDeviceProvider):
             return []
 
     def is_available(self) -> bool:
+        # 检测成功后 available_ttl 秒内直接返回，重试循环里反复探测时不必每次都启动 adb 进程
+        if time.monotonic() < self._available_until:
+            return True
         try:
             result = self._run_adb(["get-state"], timeout=5)
-            return result.returncode == 0 and "device" in result.stdout.strip()
+            available = result.returncode == 0 and "device" in result.stdout.strip()
         except Exception:
-            return False
+            available = False
+        if available:
+            self._available_until = time.monotonic() + self.available_ttl
+        return available
+
+    @staticmethod
+    def _create_turbojpeg():
+        if TurboJPEG is None:
+            return None
+        try:
+            return TurboJPEG()
+        except Exception as e:  # 找不到 libturbojpeg 动态库
+            logger.debug(f"TurboJPEG 不可用: {e}")
+            return None
+
+    def _capture_jpeg(self) -> Optional[np.ndarray]:
+        """
+        screencap -j 输出 JPEG，用 libjpeg-turbo（SIMD 加速 IDCT 和颜色转换）解码，比 libpng 解码 PNG 快数倍
+        设备不支持 -j 时输出不是 JPEG，解码失败后关闭 jpeg_capture，之后直接走 PNG
+        """
+        result = self._run_adb(["exec-out", "screencap", "-j"], text=False, timeout=15)
+        if result.returncode == 0 and result.stdout.startswith(b"\xff\xd8"):
+            try:
+                img = self._tj.decode(result.stdout)
+            except Exception as e:
+                logger.debug(f"JPEG 解码失败: {e}")
+                img = None
+            if img is not None:
+                self._screen_size = (img.shape[1], img.shape[0])
+                return img
+        logger.info("设备不支持 JPEG 截图，改用 PNG 截图")
+        self.jpeg_capture = False
+        return None
+
+    def _capture_raw(self) -> Optional[np.ndarray]:
+        """
+        通过常驻 shell 执行不带 -p 的 screencap，读取原始帧缓冲：
+        头部为 width, height, format（Android 9 起多一个 colorspace）各 4 字节，之后是 width*height*每像素字节数 的像素
+        省去进程创建以及设备端 PNG 编码、本地 PNG 解码
+        """
+        if self._raw_header_size is None:
+            result = self._run_shell(["getprop", "ro.build.version.sdk"])
+            sdk = int(result.stdout.strip() or 0) if result.returncode == 0 else 0
+            self._raw_header_size = 16 if sdk >= 28 else 12
+
+        shell = self._get_shell()
+        with shell.lock:
+            try:
+                shell.write("screencap")
+                header = np.frombuffer(shell.read_exact(self._raw_header_size), dtype="<u4")
+                w, h, fmt = int(header[0]), int(header[1]), int(header[2])
+                if not (0 < w <= 16384 and 0 < h <= 16384):
+                    raise ValueError(f"screencap 头部异常: {w}x{h} format={fmt}")
+                raw_format = _RAW_FORMATS.get(fmt)
+                if raw_format is None:
+                    # 像素数据长度未知，无法读完，丢弃 shell 后不再使用原始帧截图
+                    logger.warning(f"不支持的 screencap 像素格式 {fmt}，改用 JPEG/PNG 截图")
+                    self.raw_capture = False
+                    self._reset_shell(kill=True, shell=shell)
+                    return None
+                bpp, code = raw_format
+                data = shell.read_exact(w * h * bpp)
+            except TimeoutError:
+                # shell 已卡住，直接结束进程
+                self._reset_shell(kill=True, shell=shell)
+                raise
+            except Exception:
+                # 输出可能已错位，丢弃这个 shell
+                self._reset_shell(shell=shell)
+                raise
+
+        img = cv2.cvtColor(np.frombuffer(data, dtype=np.uint8).reshape(h, w, bpp), code)
+        self._screen_size = (w, h)
+        return img
 
     @timeit
     def capture(self) -> Optional[np.ndarray]:
+        if self.raw_capture:
+            try:
+                img = self._capture_raw()
+                if img is not None:
+                    return img
+            except Exception as e:
+                logger.error(f"原始帧截图失败，本次改用 JPEG/PNG 截图: {e}")
+        if self.jpeg_capture:
+            try:
+                img = self._capture_jpeg()
+                if img is not None:
+                    return img
+            except Exception as e:
+                logger.error(f"JPEG 截图失败: {e}")
         try:
             result = self._run_adb(["exec-out", "screencap", "-p"], text=False, timeout=15)
             if result.returncode != 0 or not result.stdout:
@@ -228,7 +519,7 @@ class ADBProvider(IDeviceProvider):
         if self._screen_size:
             return (*self._screen_size, 0, 0)
         try:
-            result = self._run_adb(["shell", "wm", "size"])
+            result = self._run_shell(["wm", "size"])
             if result.returncode == 0:
                 match = re.search(r"(\d+)x(\d+)", result.stdout)
                 if match:
@@ -241,7 +532,7 @@ class ADBProvider(IDeviceProvider):
 
     def click(self, x: int, y: int) -> bool:
         try:
-            result = self._run_adb(["shell", "input", "tap", str(x), str(y)])
+            result = self._run_shell(["input", "tap", str(x), str(y)])
             return result.returncode == 0
         except Exception:
             return False
@@ -249,7 +540,10 @@ class ADBProvider(IDeviceProvider):
     def swipe(self, x1: int, y1: int, x2: int, y2: int, duration: float = 0.2) -> bool:
         try:
             ms = max(10, int(duration * 1000))
-            result = self._run_adb(["shell", "input", "swipe", str(x1), str(y1), str(x2), str(y2), str(ms)])
+            # input swipe 执行完滑动才返回，超时时间要覆盖滑动时长
+            result = self._run_shell(
+                ["input", "swipe", str(x1), str(y1), str(x2), str(y2), str(ms)], timeout=10 + ms / 1000
+            )
             return result.returncode == 0
         except Exception:
             return False
@@ -314,10 +608,37 @@ class ADBProvider(IDeviceProvider):
             self.down_y = None
             return False
 
+    def _paste_text(self, text: str) -> bool:
+        """
+        通过 Clipper 广播写入剪贴板后发送粘贴键，整段文本只需一次广播 + 一次按键，
+        不像 input text 那样在设备端逐字符注入；设备未安装 Clipper 时返回 False 并记住结果
+        """
+        if self._clipper_available is False:
+            return False
+        # Android 8+ 不再把隐式广播投递给清单注册的接收器，必须用 -n 指定组件
+        result = self._run_shell(
+            ["am", "broadcast", "-n", CLIPPER_RECEIVER, "-a", "clipper.set", "-e", "text", _shell_quote(text)]
+        )
+        if result.returncode != 0:
+            # 命令本身失败（shell 异常等）不能说明设备没有 Clipper，本次回退即可，不缓存结果
+            return False
+        # Clipper 处理成功时广播结果为 RESULT_OK(-1)，没有接收者时为 0
+        if "result=-1" not in result.stdout:
+            if "result=0" in result.stdout:
+                logger.info("设备未安装 Clipper，输入文本改用 input text")
+                self._clipper_available = False
+            return False
+        self._clipper_available = True
+        result = self._run_shell(["input", "keyevent", str(KEYCODE_PASTE)])
+        return result.returncode == 0
+
     def input_text(self, text: str) -> bool:
         try:
+            if self._paste_text(text):
+                return True
+            # input text 用 %s 表示空格；其余字符（引号、分号、括号、换行等）由 sh 单引号原样传递
             escaped = text.replace(" ", "%s")
-            result = self._run_adb(["shell", "input", "text", escaped])
+            result = self._run_shell(["input", "text", _shell_quote(escaped)])
             return result.returncode == 0
         except Exception:
             return False
@@ -328,19 +649,19 @@ class ADBProvider(IDeviceProvider):
             return False
         try:
             if action == "tap":
-                cmd = ["shell", "input", "keyevent", str(android_code)]
+                cmd = ["input", "keyevent", str(android_code)]
             elif action == "down" or action == "longpress":
-                cmd = ["shell", "input", "keyevent", "--longpress", str(android_code)]
+                cmd = ["input", "keyevent", "--longpress", str(android_code)]
             else:
                 return False
-            result = self._run_adb(cmd)
+            result = self._run_shell(cmd)
             return result.returncode == 0
         except Exception:
             return False
 
     def get_info(self) -> Dict[str, Any]:
         try:
-            model_result = self._run_adb(["shell", "getprop", "ro.product.model"], text=True)
+            model_result = self._run_shell(["getprop", "ro.product.model"])
             model = model_result.stdout.strip() if model_result.returncode == 0 else "Unknown"
             size = self.get_size()
             return {
@@ -16,8 +16,9 @@ import time
 from gas.interfaces.interfaces import IDeviceProvider
 from gas.cons.key_code import KeyCode, get_windows_keycode
 from gas.util.keymouse_util import KeyMouseUtil
-from gas.util.hwnd_util import get_hwnd_by_class_and_title
+from gas.util.hwnd_util import get_hwnd_by_class_and_title, get_window_rect
 from gas.util.screenshot_util import screenshot, screenshot_bitblt
+from gas.util.time_util import precise_sleep
 
 from gas.logger import get_logger
 from gas.util.wrap_util import timeit
@@ -38,6 +39,14 @@ class WinProvider(IDeviceProvider):
         self._capture_mode = capture_mode
         self.activate_windows = activate_windows
 
+        # 窗口激活节流：前台已是目标窗口或距上次激活不足该毫秒数时跳过
+        self.activation_skip_ms: float = 100
+        self._last_activate_ts = 0.0
+
+        # 窗口矩形缓存 (时间戳, (left, top, right, bottom))，rect_cache_ttl 秒内复用
+        self.rect_cache_ttl: float = 0.1
+        self._rect_cache: Optional[Tuple[float, Tuple[int, int, int, int]]] = None
+
         if window_title:
             self._find_and_set_hwnd(window_title, class_name)
 
@@ -51,6 +60,7 @@ class WinProvider(IDeviceProvider):
                 return False
 
             self._hwnd = hwndList[0]
+            self._rect_cache = None
             self.window_title = win32gui.GetWindowText(self._hwnd)
             self.class_name = win32gui.GetClassName(self._hwnd)
 
@@ -69,11 +79,11 @@ class WinProvider(IDeviceProvider):
         Returns:
             Tuple[int, int, int, int]: (width, height, left, top)
         """
-        if not self.is_available():
+        if not self._hwnd:
             return None
 
         try:
-            left, top, right, bottom = win32gui.GetWindowRect(self._hwnd)
+            left, top, right, bottom = self._get_window_rect()
             width = right - left
             height = bottom - top
 
@@ -84,8 +94,30 @@ class WinProvider(IDeviceProvider):
             logger.error(f"获取窗口尺寸失败: {e}")
             return None
 
+    def _get_window_rect(self) -> Tuple[int, int, int, int]:
+        """获取窗口矩形 (left, top, right, bottom)，短时间内复用缓存避免重复的 Win32 调用"""
+        now = time.monotonic()
+        cache = self._rect_cache
+        if cache is not None and now - cache[0] < self.rect_cache_ttl:
+            return cache[1]
+        rect = get_window_rect(self._hwnd)
+        self._rect_cache = (now, rect)
+        return rect
+
     # ==================== 窗口管理功能 ====================
 
+    def _activate_window(self):
+        """按需激活窗口，避免高频操作时每次都发送激活消息"""
+        if not self.activate_windows:
+            return
+        if win32gui.GetForegroundWindow() == self._hwnd:
+            return
+        now = time.monotonic()
+        if (now - self._last_activate_ts) * 1000 < self.activation_skip_ms:
+            return
+        KeyMouseUtil.window_activate(self._hwnd)
+        self._last_activate_ts = now
+
     def set_window(self, window_title: str) -> bool:
         """设置目标窗口"""
         return self._find_and_set_hwnd(window_title)
@@ -96,14 +128,14 @@ class WinProvider(IDeviceProvider):
             return None
 
         try:
-            x, y, w, h = win32gui.GetWindowRect(self)
+            left, top, right, bottom = self._get_window_rect()
 
             info = {
                 "title": self.window_title,
                 "calssName": self.class_name,
                 "hwnd": self._hwnd,
-                "position": (x, y),
-                "size": (w, h),
+                "position": (left, top),
+                "size": (right - left, bottom - top),
             }
             return info
         except Exception as e:
@@ -113,19 +145,28 @@ class WinProvider(IDeviceProvider):
     # ==================== 截图功能 ====================
 
     @timeit
-    def capture(self) -> Optional[np.ndarray]:
-        """截图当前窗口"""
+    def capture(self, grayscale: bool = False, copy: bool = False) -> Optional[np.ndarray]:
+        """截图当前窗口
+
+        capture_mode=1 时默认返回复用缓冲的只读视图，下一次截图会覆盖其内容
+
+        Args:
+            grayscale: 是否直接返回灰度图（OCR 场景可省去一次 BGR 全图转换）
+            copy: 是否返回可写的独立副本，跨帧保留截图时使用
+        """
         if not self._hwnd:
             logger.error("未设置目标窗口，请先调用 set_window()")
             return None
 
         try:
             if self._capture_mode == 1:
-                scr = screenshot_bitblt(self._hwnd)
+                scr = screenshot_bitblt(self._hwnd, grayscale=grayscale, copy=copy)
             elif self._capture_mode == 2:
-                scr = screenshot(self._hwnd)
+                scr = screenshot(self._hwnd, copy=copy and not grayscale)
+                if grayscale and scr is not None:
+                    scr = cv2.cvtColor(scr, cv2.COLOR_BGR2GRAY)
 
-            if screenshot is not None:
+            if scr is not None:
                 logger.debug(f"截图成功，尺寸: {scr.shape}")
             else:
                 logger.error("截图失败")
@@ -145,8 +186,7 @@ class WinProvider(IDeviceProvider):
 
         try:
             # 激活窗口
-            if self.activate_windows:
-                KeyMouseUtil.window_activate(self._hwnd)
+            self._activate_window()
             KeyMouseUtil.mouse_move(x, y)
             logger.debug(f"后台移动鼠标到: ({x}, {y})")
             return True
@@ -158,11 +198,10 @@ class WinProvider(IDeviceProvider):
     def key_event(self, keycode: KeyCode, action: str = "tap") -> bool:
         """发送按键事件 - 自动转换为Windows键码"""
         try:
-            if not self.is_available():
+            if not self._hwnd:
                 return False
             # 激活窗口
-            if self.activate_windows:
-                KeyMouseUtil.window_activate(self._hwnd)
+            self._activate_window()
             # 转换为Windows键码
             win_keycode = get_windows_keycode(keycode)
             key_name = keycode.name
@@ -190,8 +229,7 @@ class WinProvider(IDeviceProvider):
 
     def click(self, x: int, y: int, action: str = "tap") -> bool:
         # 激活窗口
-        if self.activate_windows:
-            KeyMouseUtil.window_activate(self._hwnd)
+        self._activate_window()
 
         if action == "tap":
             return KeyMouseUtil.click(self._hwnd, x, y) is None
@@ -214,8 +252,7 @@ class WinProvider(IDeviceProvider):
         """
         try:
             # 激活窗口
-            if self.activate_windows:
-                KeyMouseUtil.window_activate(self._hwnd)
+            self._activate_window()
 
             # 移动到起点
             KeyMouseUtil.mouse_action(self._hwnd, x1, y1, "move", 0.03)
@@ -224,26 +261,27 @@ class WinProvider(IDeviceProvider):
                 # 拖拽模式：按下左键
                 KeyMouseUtil.mouse_action(self._hwnd, x1, y1, "down", 0.05)
 
-            # 计算移动路径
-            distance = math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
-            num_points = max(3, int(distance / 10))
+            # 计算移动路径：按距离每 10 像素一个点，且每点间隔不超过约 8ms，短距离慢滑也足够平滑
+            distance = math.hypot(x2 - x1, y2 - y1)
+            num_points = max(3, int(distance / 10), int(duration * 1000) // 8)
+            step = duration / num_points
+            # 根据模式选择移动类型
+            action_type = "drag" if is_drga else "move"
 
-            # 移动过程
+            # 移动过程：按截止时间等待，各点的处理耗时不会累加到总时长上
+            next_ts = time.perf_counter()
             for i in range(num_points):
                 t = i / (num_points - 1)
                 # 线性插值 + 随机波动
                 x = x1 + (x2 - x1) * t + random.randint(-3, 3)
                 y = y1 + (y2 - y1) * t + random.randint(-3, 3)
-
-                # 根据模式选择移动类型
-                action_type = "drag" if is_drga else "move"
                 KeyMouseUtil.mouse_action(self._hwnd, int(x), int(y), action_type, 0)
 
-                # 控制移动速度
-                time.sleep(duration / num_points * random.uniform(0.9, 1.1))
+                # 控制移动速度：几毫秒的间隔用 precise_sleep，不会被系统时钟周期放大到 15ms
+                next_ts += step * random.uniform(0.9, 1.1)
+                precise_sleep(next_ts - time.perf_counter())
 
             # 确保到达终点
-            action_type = "drag" if is_drga else "move"
             KeyMouseUtil.mouse_action(self._hwnd, x2, y2, action_type, 0.05)
 
             if is_drga:
@@ -271,8 +309,8 @@ class WinProvider(IDeviceProvider):
                 logger.error("未设置目标窗口")
                 return False
 
-            if self.activate_windows:
-                KeyMouseUtil.window_activate(self._hwnd)
+            # 激活窗口
+            self._activate_window()
 
             KeyMouseUtil.mouse_action(self._hwnd, x, y, action, delay)
             logger.debug(f"鼠标操作: {action} at ({x}, {y}) delay={delay}")
@@ -283,11 +321,27 @@ class WinProvider(IDeviceProvider):
             return False
 
     def input_text(self, text: str) -> bool:
-        """输入文本"""
-        pass
+        """输入文本
+
+        目标窗口在前台时整段文本通过一次 SendInput（Unicode）提交；
+        在后台时向窗口连续投递 WM_CHAR，两种方式都没有逐字符等待
+        """
+        if not self._hwnd:
+            logger.error("未设置目标窗口")
+            return False
+
+        try:
+            self._activate_window()
+            target = None if win32gui.GetForegroundWindow() == self._hwnd else self._hwnd
+            KeyMouseUtil.input_text(target, text)
+            logger.debug(f"输入文本: {len(text)} 个字符, {'SendInput' if target is None else 'WM_CHAR'}")
+            return True
+        except Exception as e:
+            logger.error(f"输入文本失败: {e}")
+            return False
 
     def is_available(self) -> bool:
-        return True
+        return self._hwnd is not None
 
     def get_info(self) -> dict:
         """获取设备信息"""
@@ -1,14 +1,32 @@
 # src/operation_player.py
+import asyncio
+import itertools
+import threading
 import time
-from typing import List, Optional
+from typing import Callable, List, Optional, Tuple
 from dataclasses import dataclass
 
-from .operation_recorder import OperationData, OperationRecorder
+import numpy as np
+
+from .operation_recorder import OperationColumns, OperationData, OperationRecorder
 from gas.interfaces.interfaces import IDeviceProvider
 from gas.logger import get_logger  # ← 统一使用你的日志系统
+from gas.util.time_util import SPIN_MARGIN, SPIN_THRESHOLD, high_resolution_timer
 
 logger = get_logger()
 
+# 以按下状态（False/True 即 0/1）为下标选择鼠标移动的动作类型
+_MOVE_ACTION = ("move", "drag")
+_MOVE_LABEL = ("移动", "拖拽")
+
+
+def _noop() -> bool:
+    return True
+
+
+def _fail() -> bool:
+    return False
+
 
 @dataclass
 class ReplayConfig:
@@ -18,6 +36,9 @@ class ReplayConfig:
     start_delay: float = 1.0  # 开始回放前的延迟（秒）
     loop: bool = False  # 是否循环播放（replay_loop 时有效）
     stop_on_error: bool = True  # 执行失败是否立即停止
+    coalesce_moves: bool = True  # 加载时合并连续的鼠标移动事件
+    move_coalesce_interval: float = 0.016  # 连续移动事件的最小保留间隔（秒），约 60Hz
+    start_at: float = 0.0  # 从录制中的第几秒开始回放，跳过之前的操作
 
 
 class OperationPlayer:
@@ -33,30 +54,83 @@ class OperationPlayer:
         self.screen_height: int = 1080
         self.config = ReplayConfig()
 
-        self.last_x: Optional[int] = None
-        self.last_y: Optional[int] = None
         self.is_pressed: bool = False
+        self._press_pos: Tuple[int, int] = (0, 0)  # 按下期间鼠标最后所在位置，提前结束时在此补发抬起
+        # 每次回放开始时获取一次屏幕尺寸，避免每个事件都调用 device.get_size()
+        self._cached_size: Optional[Tuple[int, int]] = None
+        # 置位后回放循环在下一个操作前退出
+        self._stop_event = threading.Event()
+        # 预编译的回放程序：(时间戳, 无参动作)，按屏幕尺寸缓存，加载新操作后失效
+        self._program: Optional[List[Tuple[float, Callable[[], bool]]]] = None
+        self._program_size: Optional[Tuple[int, int]] = None
+        self._timestamps: Optional[np.ndarray] = None  # 各操作时间戳，用于 start_at 二分定位
 
     def load_from_recorder(self, recorder: OperationRecorder):
         """从录制器直接加载操作"""
-        self.operations = recorder.get_operations()
+        self.operations = self._coalesce_moves(recorder.get_operations())
+        self._program = None
         self.screen_width = recorder.screen_width
         self.screen_height = recorder.screen_height
         logger.info(f"从 Recorder 加载了 {len(self.operations)} 个操作")
         return self
 
     def load_from_file(self, filename: str):
-        """从 JSON 文件加载操作（复用 Recorder 的加载逻辑）"""
-        temp_recorder = OperationRecorder()
-        if temp_recorder.load_from_file(filename):
-            self.operations = temp_recorder.get_operations()
-            self.screen_width = temp_recorder.screen_width
-            self.screen_height = temp_recorder.screen_height
-            logger.info(f"从文件 {filename} 加载了 {len(self.operations)} 个操作")
-        else:
-            logger.error(f"从文件 {filename} 加载操作失败")
+        """从 JSON / NDJSON 文件加载操作（复用 Recorder 的解析逻辑，直接写入回放器）
+
+        以 .ndjson 结尾的文件按 NDJSON 格式逐行解析
+        """
+        try:
+            if filename.endswith(".ndjson"):
+                self.screen_width, self.screen_height, _, ops = OperationRecorder._read_ndjson(filename)
+            else:
+                data = OperationRecorder._read_json(filename)
+                self.screen_width, self.screen_height, _, ops = OperationRecorder._parse_json(data)
+        except Exception as e:
+            logger.error(f"从文件 {filename} 加载操作失败: {e}")
+            return self
+
+        self.operations = self._coalesce_moves(ops)
+        self._program = None
+        logger.info(f"从文件 {filename} 加载了 {len(self.operations)} 个操作")
         return self
 
+    def _coalesce_moves(self, ops: List[OperationData]) -> List[OperationData]:
+        """合并连续的鼠标移动事件
+
+        无论是否按下，连续移动都按 move_coalesce_interval 抽稀，每个时间窗口保留最后一个采样，
+        拖拽轨迹和悬停时的光标路径、节奏都能保留
+        """
+        cfg = self.config
+        if not cfg.coalesce_moves or not ops:
+            return ops
+
+        interval = cfg.move_coalesce_interval
+        result: List[OperationData] = []
+        pending: Optional[OperationData] = None
+        window_start = 0.0
+
+        for op in ops:
+            if op.type == "mouse" and op.mouse_action == "move":
+                if pending is not None and op.timestamp - window_start > interval:
+                    result.append(pending)
+                    pending = None
+                if pending is None:
+                    window_start = op.timestamp
+                pending = op
+                continue
+
+            if pending is not None:
+                result.append(pending)
+                pending = None
+            result.append(op)
+
+        if pending is not None:
+            result.append(pending)
+
+        if len(result) != len(ops):
+            logger.debug("合并鼠标移动事件: %d -> %d", len(ops), len(result))
+        return result
+
     def _get_current_screen_size(self) -> tuple[int, int]:
         """获取当前设备屏幕尺寸，用于坐标反归一化"""
         size = self.device.get_size()
@@ -65,16 +139,31 @@ class OperationPlayer:
         logger.warning("无法获取当前屏幕尺寸，使用默认 1920x1080")
         return 1920, 1080
 
+    def _screen_size(self) -> Tuple[int, int]:
+        """返回本次回放缓存的屏幕尺寸，未缓存时才向设备查询"""
+        if self._cached_size is None:
+            self._cached_size = self._get_current_screen_size()
+        return self._cached_size
+
+    def invalidate_size(self):
+        """窗口尺寸变化后调用，下次反归一化时重新获取屏幕尺寸"""
+        self._cached_size = None
+
     def _denormalize_x(self, norm_x: float) -> int:
-        w, _ = self._get_current_screen_size()
+        w, _ = self._screen_size()
         return int(norm_x * w)
 
     def _denormalize_y(self, norm_y: float) -> int:
-        _, h = self._get_current_screen_size()
+        _, h = self._screen_size()
         return int(norm_y * h)
 
     def replay(self, config: Optional[ReplayConfig] = None) -> bool:
         """执行一次回放"""
+        self._stop_event.clear()
+        return self._replay(config)
+
+    def _replay(self, config: Optional[ReplayConfig] = None) -> bool:
+        """回放主体，不清除停止标志（由调用方在开始前清除，避免丢失刚发出的 stop）"""
         if not self.operations:
             logger.warning("没有可回放的操作序列")
             return False
@@ -84,104 +173,209 @@ class OperationPlayer:
             return False
 
         cfg = config or self.config
+        self._cached_size = self._get_current_screen_size()
+        if self._program is None or self._program_size != self._cached_size:
+            self._compile()
+        program = self._program
 
-        logger.info(f"开始回放，共 {len(self.operations)} 个操作 | 速度: {cfg.speed}x | 起始延迟: {cfg.start_delay}s")
+        logger.info(f"开始回放，共 {len(program)} 个操作 | 速度: {cfg.speed}x | 起始延迟: {cfg.start_delay}s")
 
         # 重置回放状态
         self.is_pressed = False
-        self.last_x = None
-        self.last_y = None
-
-        time.sleep(cfg.start_delay)
-
-        last_timestamp = 0.0
-
-        try:
-            for i, op in enumerate(self.operations):
-                # 计算并等待相对时间间隔（支持变速）
-                sleep_duration = (op.timestamp - last_timestamp) / cfg.speed
-                if sleep_duration > 0:
-                    time.sleep(sleep_duration)
-                last_timestamp = op.timestamp
-
-                success = self._execute_operation(op)
-                if not success:
-                    logger.error(f"第 {i+1}/{len(self.operations)} 个操作执行失败")
-                    if cfg.stop_on_error:
-                        logger.info("因 stop_on_error=True，已停止回放")
+        stop_event = self._stop_event
+
+        # 回放期间提高系统计时器精度，否则 Windows 下的短 sleep 会被拉长到约 15.6ms
+        with high_resolution_timer():
+            if stop_event.wait(cfg.start_delay):
+                logger.info("回放已被停止")
+                return False
+
+            speed = cfg.speed
+            total = len(program)
+            start_idx = 0
+            if cfg.start_at > 0:
+                # 二分定位到第一个时间戳 >= start_at 的操作
+                start_idx = int(np.searchsorted(self._timestamps, cfg.start_at))
+                logger.info(f"从 {cfg.start_at}s 处开始回放，跳过前 {start_idx} 个操作")
+            # 以回放起点为基准计算每个操作的绝对截止时间，sleep 的误差不会逐个累积
+            # 使用 perf_counter：Windows 上 Python 3.13 之前的 monotonic 精度只有约 15.6ms，忙等会抖动一个时钟周期
+            perf_counter = time.perf_counter
+            t0 = perf_counter() - cfg.start_at / speed
+
+            try:
+                for entry in itertools.islice(program, start_idx, None):
+                    # 落后于计划或等待落在忙等窗口内时不会调用 wait，每个操作前都检查一次停止标志
+                    if stop_event.is_set():
+                        logger.info("回放已被停止")
                         return False
-                    else:
-                        logger.warning("操作失败但继续执行后续操作")
-
-            logger.info("全部操作回放完成")
-            return True
-
-        except KeyboardInterrupt:
-            logger.warning("回放被用户手动中断（Ctrl+C）")
-            return False
-        except Exception as e:
-            logger.exception(f"回放过程中发生未捕获异常: {e}")
-            return False
+                    timestamp, step = entry
+                    deadline = t0 + timestamp / speed
+                    remaining = deadline - perf_counter()
+                    # 与 precise_sleep 相同的策略：可中断地等到截止时间前 SPIN_MARGIN，剩余部分忙等
+                    if remaining >= SPIN_THRESHOLD and stop_event.wait(remaining - SPIN_MARGIN):
+                        logger.info("回放已被停止")
+                        return False
+                    while perf_counter() < deadline:
+                        if stop_event.is_set():
+                            logger.info("回放已被停止")
+                            return False
+
+                    try:
+                        success = step()
+                    except Exception as e:
+                        # 序号只在失败时才反查，正常路径不维护计数
+                        i = program.index(entry, start_idx)
+                        logger.error(f"执行操作时异常: {self.operations[i]} | 错误: {e}")
+                        success = False
+                    if not success:
+                        i = program.index(entry, start_idx)
+                        logger.error(f"第 {i+1}/{total} 个操作执行失败")
+                        if cfg.stop_on_error:
+                            logger.info("因 stop_on_error=True，已停止回放")
+                            return False
+                        else:
+                            logger.warning("操作失败但继续执行后续操作")
+
+                logger.info("全部操作回放完成")
+                return True
 
-    def _execute_operation(self, op: OperationData) -> bool:
-        """执行单个录制操作，返回是否成功"""
+            except KeyboardInterrupt:
+                logger.warning("回放被用户手动中断（Ctrl+C）")
+                return False
+            except Exception as e:
+                logger.exception(f"回放过程中发生未捕获异常: {e}")
+                return False
+            finally:
+                # 提前退出（停止、出错）时如果仍处于按下状态，补发抬起，避免左键一直按住
+                self._release_pressed()
+
+    def _release_pressed(self):
+        if not self.is_pressed:
+            return
+        x, y = self._press_pos
+        self.is_pressed = False
         try:
-            if op.type == "mouse":
-                x = self._denormalize_x(op.pos_x)
-                y = self._denormalize_y(op.pos_y)
-
-                success = True
-
-                if op.mouse_action == "move":
-                    # 拖拽中用 drag，否则用 move
-                    action_type = "drag" if self.is_pressed else "move"
-                    success = self.device.mouse_action(x, y, action_type, 0.005)  # delay 调小更流畅
-                    logger.debug(f"鼠标{'拖拽' if self.is_pressed else '移动'}到: ({x}, {y})")
-
-                elif op.mouse_action == "click":
-                    if op.mouse_event == "down":
-                        # down 前确保位置（虽然 move 已覆盖，但保险）
-                        self.device.mouse_action(x, y, "move", 0.005)
-                        success = self.device.mouse_action(x, y, "down", 0.02)
-                        logger.debug(f"鼠标按下: ({x}, {y})")
-                        self.is_pressed = True
-
-                    elif op.mouse_event == "up":
-                        # up 前如果在拖拽，确保最后一段是 drag
-                        if self.is_pressed:
-                            self.device.mouse_action(x, y, "drag", 0.005)
-                        success = self.device.mouse_action(x, y, "up", 0.02)
-                        logger.debug(f"鼠标抬起: ({x}, {y})")
-                        self.is_pressed = False
-
-                elif op.mouse_action == "scroll":
-                    logger.debug(f"鼠标滚轮: delta={op.scroll} at ({x}, {y})（暂未实现）")
+            self.device.mouse_action(x, y, "up", 0)
+            logger.debug("回放结束时补发鼠标抬起: (%d, %d)", x, y)
+        except Exception as e:
+            logger.error(f"补发鼠标抬起失败: {e}")
+
+    async def replay_async(self, config: Optional[ReplayConfig] = None) -> bool:
+        """在工作线程中执行回放，不阻塞事件循环；可配合 stop() 从其他协程中止"""
+        # 在启动线程前清除停止标志，调用后立即发出的 stop() 不会被回放线程清掉
+        self._stop_event.clear()
+        return await asyncio.to_thread(self._replay, config)
+
+    def stop(self):
+        """请求停止正在进行的回放"""
+        self._stop_event.set()
+
+    def _compile(self):
+        """把操作序列预编译为无参动作列表
+
+        录制内容加载后就已确定：坐标按当前屏幕尺寸一次性反归一化，
+        move/drag 的选择按 down/up 顺序静态推导，回放循环只需依次调用
+        """
+        w, h = self._screen_size()
+        cols = OperationColumns.from_operations(self.operations)
+        xs, ys = cols.denormalize(w, h)
+
+        program: List[Tuple[float, Callable[[], bool]]] = []
+        pressed = False
+        for op, x, y in zip(self.operations, xs.tolist(), ys.tolist()):
+            step, pressed = self._compile_operation(op, x, y, pressed)
+            program.append((op.timestamp, step))
+
+        self._program = program
+        self._program_size = (w, h)
+        self._timestamps = cols.timestamps
+        logger.debug("回放程序已编译: %d 个操作, 屏幕 %dx%d", len(program), w, h)
+
+    def _compile_operation(
+        self, op: OperationData, x: int, y: int, pressed: bool
+    ) -> Tuple[Callable[[], bool], bool]:
+        """编译单个操作，返回 (无参动作, 执行后的按下状态)"""
+        mouse_action = self.device.mouse_action
+
+        if op.type == "mouse":
+            if op.mouse_action == "move":
+                # 拖拽中用 drag，否则用 move；按下状态在编译期已确定，直接查表
+                action_type = _MOVE_ACTION[pressed]
+                label = _MOVE_LABEL[pressed]
+
+                if pressed:
+
+                    def step():
+                        # 记录拖拽到的位置，提前结束时在这里补发抬起
+                        self._press_pos = (x, y)
+                        logger.debug("鼠标%s到: (%d, %d)", label, x, y)
+                        return mouse_action(x, y, action_type, 0.005)
+
+                    return step, pressed
+
+                def step():
+                    logger.debug("鼠标%s到: (%d, %d)", label, x, y)
+                    return mouse_action(x, y, action_type, 0.005)  # delay 调小更流畅
+
+                return step, pressed
+
+            if op.mouse_action == "click" and op.mouse_event == "down":
+
+                def step():
+                    # down 前确保位置（虽然 move 已覆盖，但保险）
+                    mouse_action(x, y, "move", 0.005)
+                    self.is_pressed = True
+                    self._press_pos = (x, y)
+                    logger.debug("鼠标按下: (%d, %d)", x, y)
+                    return mouse_action(x, y, "down", 0.02)
+
+                return step, True
+
+            if op.mouse_action == "click" and op.mouse_event == "up":
+
+                def step():
+                    # up 前如果在拖拽，确保最后一段是 drag
+                    if pressed:
+                        mouse_action(x, y, "drag", 0.005)
+                    self.is_pressed = False
+                    logger.debug("鼠标抬起: (%d, %d)", x, y)
+                    return mouse_action(x, y, "up", 0.02)
+
+                return step, False
+
+            if op.mouse_action == "scroll":
+
+                def step():
+                    logger.debug("鼠标滚轮: delta=%s at (%d, %d)（暂未实现）", op.scroll, x, y)
                     return True
 
-                self.last_x = x
-                self.last_y = y
-                return success
+                return step, pressed
 
-            elif op.type == "keyboard":
-                logger.debug(f"键盘事件: {op.key} {op.key_event}")
-                # 简单实现：如果是一般字符，直接 input_text
-                # 后续可扩展为 KeyCode 映射 + key_event
-                if op.key_event in ("down", "tap") and len(op.key or "") == 1:
-                    return self.device.input_text(op.key)
-                return True
+            return _noop, pressed
 
-        except Exception as e:
-            logger.error(f"执行操作时异常: {op} | 错误: {e}")
-            return False
+        if op.type == "keyboard":
+            # 简单实现：如果是一般字符，直接 input_text
+            # 后续可扩展为 KeyCode 映射 + key_event
+            if op.key_event in ("down", "tap") and len(op.key or "") == 1:
+                input_text = self.device.input_text
+                key = op.key
+
+                def step():
+                    logger.debug("键盘事件: %s %s", key, op.key_event)
+                    return input_text(key)
+
+                return step, pressed
+            return _noop, pressed
 
-        return False
+        return _fail, pressed
 
     def replay_loop(self, count: int = -1, delay_between: float = 2.0, config: Optional[ReplayConfig] = None):
         """循环回放"""
+        self._stop_event.clear()
         i = 1
         while count < 0 or i <= count:
             logger.info(f"第 {i} 次循环回放开始")
-            success = self.replay(config)
+            success = self._replay(config)
             if not success:
                 logger.error(f"第 {i} 次回放失败，停止循环")
                 break
@@ -189,6 +383,8 @@ class OperationPlayer:
             i += 1
             if (count < 0 or i <= count) and delay_between > 0:
                 logger.info(f"循环间隔等待 {delay_between}s")
-                time.sleep(delay_between)
+                if self._stop_event.wait(delay_between):
+                    logger.info("回放已被停止")
+                    break
 
         logger.info("循环回放结束")
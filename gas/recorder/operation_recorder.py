@@ -1,15 +1,24 @@
 import time
 import json
-from dataclasses import dataclass, field
+import operator
+import queue
+from dataclasses import dataclass, field, fields
 from typing import Optional, Literal
 from pathlib import Path
 
+import numpy as np
+
 from gas.logger import get_logger
 
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时回退到标准库 json
+    orjson = None
+
 log = get_logger()
 
 
-@dataclass
+@dataclass(slots=True)
 class OperationData:
     """优化后的操作数据类"""
 
@@ -29,19 +38,80 @@ class OperationData:
     key: Optional[str] = None
     key_event: Optional[Literal["down", "up"]] = None
 
-    def __post_init__(self):
-        """数据验证"""
+    def validate(self):
+        """数据验证，不合法时抛出 ValueError
+
+        不放在 __post_init__ 中：录制时由 add_* 方法保证字段完整，只在加载外部文件后统一校验
+        """
         if self.type == "mouse":
-            assert self.mouse_action is not None, "鼠标操作必须指定动作类型"
-            if self.mouse_action == "click":
-                assert self.mouse_button is not None, "点击操作必须指定按钮"
-                assert self.mouse_event is not None, "点击操作必须指定事件"
-            if self.mouse_action in ["click", "move"]:
-                assert self.pos_x is not None and self.pos_y is not None, "点击和移动操作必须指定坐标"
+            if self.mouse_action is None:
+                raise ValueError("鼠标操作必须指定动作类型")
+            if self.mouse_action == "click" and (self.mouse_button is None or self.mouse_event is None):
+                raise ValueError("点击操作必须指定按钮和事件")
+            if self.mouse_action in ("click", "move") and (self.pos_x is None or self.pos_y is None):
+                raise ValueError("点击和移动操作必须指定坐标")
 
         elif self.type == "keyboard":
-            assert self.key is not None, "键盘操作必须指定按键"
-            assert self.key_event is not None, "键盘操作必须指定事件"
+            if self.key is None or self.key_event is None:
+                raise ValueError("键盘操作必须指定按键和事件")
+
+
+# 序列化时的字段顺序，与 OperationData 定义一致
+_FIELDS = tuple(f.name for f in fields(OperationData))
+_get_fields = operator.attrgetter(*_FIELDS)
+
+
+def _op_to_dict(op: OperationData) -> dict:
+    return dict(zip(_FIELDS, _get_fields(op)))
+
+
+def _op_from_dict(op_data: dict) -> OperationData:
+    return OperationData(
+        type=op_data["type"],
+        timestamp=op_data["timestamp"],
+        mouse_action=op_data.get("mouse_action"),
+        mouse_button=op_data.get("mouse_button"),
+        mouse_event=op_data.get("mouse_event"),
+        pos_x=op_data.get("pos_x"),
+        pos_y=op_data.get("pos_y"),
+        scroll=op_data.get("scroll"),
+        key=op_data.get("key"),
+        key_event=op_data.get("key_event"),
+    )
+
+
+def _dumps_line(obj) -> bytes:
+    """序列化为单行 JSON（不含换行符）"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    if isinstance(obj, OperationData):
+        obj = _op_to_dict(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def _loads_line(line: bytes):
+    return orjson.loads(line) if orjson is not None else json.loads(line)
+
+
+@dataclass
+class OperationColumns:
+    """按列存储的操作数据（SoA），供回放时批量计算坐标和时间"""
+
+    timestamps: np.ndarray  # float64[N]
+    pos_x: np.ndarray  # float32[N]，没有坐标的操作为 0
+    pos_y: np.ndarray  # float32[N]
+
+    @classmethod
+    def from_operations(cls, operations: list[OperationData]) -> "OperationColumns":
+        n = len(operations)
+        timestamps = np.fromiter((op.timestamp for op in operations), dtype=np.float64, count=n)
+        pos_x = np.fromiter((op.pos_x or 0.0 for op in operations), dtype=np.float32, count=n)
+        pos_y = np.fromiter((op.pos_y or 0.0 for op in operations), dtype=np.float32, count=n)
+        return cls(timestamps, pos_x, pos_y)
+
+    def denormalize(self, width: int, height: int) -> tuple[np.ndarray, np.ndarray]:
+        """一次性把归一化坐标还原为像素坐标"""
+        return (self.pos_x * width).astype(np.int32), (self.pos_y * height).astype(np.int32)
 
 
 class OperationRecorder:
@@ -49,13 +119,45 @@ class OperationRecorder:
     优化后的操作录制器
     """
 
-    def __init__(self, screen_width: int = 1920, screen_height: int = 1080):
+    def __init__(
+        self,
+        screen_width: int = 1920,
+        screen_height: int = 1080,
+        move_min_dx_px: int = 2,
+        move_min_dt_s: float = 0.008,
+    ):
+        """
+        Args:
+            move_min_dx_px: 与上一个移动采样的曼哈顿距离小于该值（像素）
+            move_min_dt_s: 且时间间隔小于该值（秒）时，覆盖上一个采样而不是追加
+        """
         self.operations: list[OperationData] = []
         self.is_recording = False
-        self.start_time = None
+        self.start_time = None  # 墙上时间，仅作为元数据保存
+        self._start_mono = 0.0  # 单调时钟起点，操作时间戳都相对它计算
         self.screen_width = screen_width
         self.screen_height = screen_height
 
+        self.move_min_dx_px = move_min_dx_px
+        self.move_min_dt_s = move_min_dt_s
+        self._last_move_x: Optional[int] = None
+        self._last_move_y: Optional[int] = None
+        self._last_move_t = 0.0
+
+        # add_* 通常在 pynput 监听线程中被回调，只入队原始事件并立即返回；
+        # 构造 OperationData、抽稀和日志都推迟到读取操作的线程中 _drain() 时完成
+        self._events: queue.SimpleQueue = queue.SimpleQueue()
+
+    def _drain(self):
+        """处理队列中尚未写入 operations 的事件"""
+        get = self._events.get_nowait
+        while True:
+            try:
+                handler, args = get()
+            except queue.Empty:
+                return
+            handler(*args)
+
     def start_recording(self, screen_width: int = None, screen_height: int = None):
         """
         开始录制操作
@@ -64,9 +166,12 @@ class OperationRecorder:
             screen_width: 屏幕宽度，用于坐标归一化
             screen_height: 屏幕高度，用于坐标归一化
         """
+        self._drain()
         self.operations.clear()
+        self._last_move_x = self._last_move_y = None
         self.is_recording = True
         self.start_time = time.time()
+        self._start_mono = time.monotonic()
 
         if screen_width is not None:
             self.screen_width = screen_width
@@ -78,14 +183,17 @@ class OperationRecorder:
     def stop_recording(self):
         """停止录制操作"""
         self.is_recording = False
+        self._drain()
         operation_count = len(self.operations)
         log.info(f"停止录制，共录制 {operation_count} 个操作")
 
     def update_screen_size(self, width: int, height: int):
         """更新屏幕尺寸"""
+        # 已入队的事件按旧尺寸归一化
+        self._drain()
         self.screen_width = width
         self.screen_height = height
-        log.debug(f"更新屏幕尺寸: {width}x{height}")
+        log.debug("更新屏幕尺寸: %dx%d", width, height)
 
     # ==================== 鼠标操作录制 ====================
 
@@ -99,9 +207,24 @@ class OperationRecorder:
             button: 鼠标按钮 left/right/middle
             event: 事件类型 down/up
         """
-        if not self.is_recording:
-            return
+        if self.is_recording:
+            self._events.put((self._record_click, (x, y, button, event, time.monotonic() - self._start_mono)))
 
+    def add_mouse_move(self, x: int, y: int):
+        """
+        添加鼠标移动操作
+        """
+        if self.is_recording:
+            self._events.put((self._record_move, (x, y, time.monotonic() - self._start_mono)))
+
+    def add_mouse_scroll(self, x: int, y: int, delta: int):
+        """
+        添加鼠标滚轮操作
+        """
+        if self.is_recording:
+            self._events.put((self._record_scroll, (x, y, delta, time.monotonic() - self._start_mono)))
+
+    def _record_click(self, x: int, y: int, button: str, event: str, timestamp: float):
         operation = OperationData(
             type="mouse",
             mouse_action="click",
@@ -109,45 +232,46 @@ class OperationRecorder:
             mouse_event=event,
             pos_x=self._normalize_x(x),
             pos_y=self._normalize_y(y),
-            timestamp=time.time() - self.start_time,
+            timestamp=timestamp,
         )
         self.operations.append(operation)
-        log.debug(f"录制鼠标点击: {button} {event} at ({x}, {y})")
-
-    def add_mouse_move(self, x: int, y: int):
-        """
-        添加鼠标移动操作
-        """
-        if not self.is_recording:
-            return
+        log.debug("录制鼠标点击: %s %s at (%d, %d)", button, event, x, y)
 
+    def _record_move(self, x: int, y: int, timestamp: float):
         operation = OperationData(
             type="mouse",
             mouse_action="move",
             pos_x=self._normalize_x(x),
             pos_y=self._normalize_y(y),
-            timestamp=time.time() - self.start_time,
+            timestamp=timestamp,
         )
-        self.operations.append(operation)
-        log.debug(f"录制鼠标移动: ({x}, {y})")
 
-    def add_mouse_scroll(self, x: int, y: int, delta: int):
-        """
-        添加鼠标滚轮操作
-        """
-        if not self.is_recording:
+        # 与上一个移动采样距离和间隔都很小时，覆盖它而不是追加（上一个操作必须仍是该移动）
+        if (
+            self._last_move_x is not None
+            and self.operations
+            and self.operations[-1].mouse_action == "move"
+            and abs(x - self._last_move_x) + abs(y - self._last_move_y) < self.move_min_dx_px
+            and timestamp - self._last_move_t < self.move_min_dt_s
+        ):
+            self.operations[-1] = operation
             return
 
+        self._last_move_x, self._last_move_y, self._last_move_t = x, y, timestamp
+        self.operations.append(operation)
+        log.debug("录制鼠标移动: (%d, %d)", x, y)
+
+    def _record_scroll(self, x: int, y: int, delta: int, timestamp: float):
         operation = OperationData(
             type="mouse",
             mouse_action="scroll",
             pos_x=self._normalize_x(x),
             pos_y=self._normalize_y(y),
             scroll=delta,
-            timestamp=time.time() - self.start_time,
+            timestamp=timestamp,
         )
         self.operations.append(operation)
-        log.debug(f"录制鼠标滚轮: delta={delta} at ({x}, {y})")
+        log.debug("录制鼠标滚轮: delta=%s at (%d, %d)", delta, x, y)
 
     # ==================== 键盘操作录制 ====================
 
@@ -159,12 +283,13 @@ class OperationRecorder:
             key: 按键名称
             event: 事件类型 down/up
         """
-        if not self.is_recording:
-            return
+        if self.is_recording:
+            self._events.put((self._record_keyboard, (key, event, time.monotonic() - self._start_mono)))
 
-        operation = OperationData(type="keyboard", key=key, key_event=event, timestamp=time.time() - self.start_time)
+    def _record_keyboard(self, key: str, event: str, timestamp: float):
+        operation = OperationData(type="keyboard", key=key, key_event=event, timestamp=timestamp)
         self.operations.append(operation)
-        log.debug(f"录制键盘事件: {key} {event}")
+        log.debug("录制键盘事件: %s %s", key, event)
 
     # ==================== 工具方法 ====================
 
@@ -184,44 +309,67 @@ class OperationRecorder:
         """将归一化y坐标还原为实际坐标"""
         return int(y * self.screen_height)
 
+    def renormalize(self, width: int, height: int):
+        """屏幕尺寸变化后，按新尺寸重新归一化全部坐标（保持原像素位置不变）
+
+        批量用 numpy 计算比例后一次写回，代替逐个操作调用 _normalize_x/_y
+        """
+        self._drain()
+        if width <= 0 or height <= 0:
+            log.error(f"无效的屏幕尺寸: {width}x{height}")
+            return
+        ops = [op for op in self.operations if op.pos_x is not None and op.pos_y is not None]
+        if ops:
+            n = len(ops)
+            xs = np.fromiter((op.pos_x for op in ops), dtype=np.float64, count=n)
+            ys = np.fromiter((op.pos_y for op in ops), dtype=np.float64, count=n)
+            xs *= self.screen_width / width
+            ys *= self.screen_height / height
+            for op, x, y in zip(ops, xs.tolist(), ys.tolist()):
+                op.pos_x = x
+                op.pos_y = y
+        log.debug("重新归一化 %d 个坐标: %dx%d -> %dx%d", len(ops), self.screen_width, self.screen_height, width, height)
+        self.screen_width = width
+        self.screen_height = height
+
     def get_operations(self) -> list[OperationData]:
         """获取录制的操作列表"""
+        self._drain()
         return self.operations.copy()
 
+    def to_columns(self) -> OperationColumns:
+        """获取按列存储的操作数据"""
+        self._drain()
+        return OperationColumns.from_operations(self.operations)
+
     def clear_operations(self):
         """清空操作记录"""
+        self._drain()
         self.operations.clear()
         log.info("清空操作记录")
 
     def save_to_file(self, filename: str):
         """保存操作记录到JSON文件"""
+        self._drain()
         try:
             data = {
                 "screen_width": self.screen_width,
                 "screen_height": self.screen_height,
                 "start_time": self.start_time,
-                "operations": [
-                    {
-                        "type": op.type,
-                        "timestamp": op.timestamp,
-                        "mouse_action": op.mouse_action,
-                        "mouse_button": op.mouse_button,
-                        "mouse_event": op.mouse_event,
-                        "pos_x": op.pos_x,
-                        "pos_y": op.pos_y,
-                        "scroll": op.scroll,
-                        "key": op.key,
-                        "key_event": op.key_event,
-                    }
-                    for op in self.operations
-                ],
+                "operations": self.operations,
             }
 
             # 确保目录存在
             Path(filename).parent.mkdir(parents=True, exist_ok=True)
 
-            with open(filename, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            if orjson is not None:
+                # orjson 在 C 层直接序列化 dataclass，输出 UTF-8 字节
+                with open(filename, "wb") as f:
+                    f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+            else:
+                data["operations"] = [_op_to_dict(op) for op in self.operations]
+                with open(filename, "w", encoding="utf-8") as f:
+                    json.dump(data, f, indent=2, ensure_ascii=False)
 
             log.info(f"操作记录已保存到: {filename}")
             return True
@@ -230,31 +378,91 @@ class OperationRecorder:
             log.error(f"保存操作记录失败: {e}")
             return False
 
+    @staticmethod
+    def _read_json(filename: str) -> dict:
+        """读取 JSON 文件，优先使用 orjson"""
+        if orjson is not None:
+            with open(filename, "rb") as f:
+                return orjson.loads(f.read())
+        with open(filename, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @classmethod
+    def _parse_json(cls, data: dict) -> tuple[int, int, Optional[float], list[OperationData]]:
+        """解析操作记录数据，返回 (screen_width, screen_height, start_time, operations)"""
+        operations = [_op_from_dict(op_data) for op_data in data.get("operations", [])]
+        cls.validate(operations)
+        return (
+            data.get("screen_width", 1920),
+            data.get("screen_height", 1080),
+            data.get("start_time"),
+            operations,
+        )
+
+    @staticmethod
+    def validate(operations: list[OperationData]):
+        """校验整个操作序列，第一个不合法的操作抛出 ValueError（附带序号）"""
+        for i, op in enumerate(operations):
+            try:
+                op.validate()
+            except ValueError as e:
+                raise ValueError(f"第 {i + 1} 个操作不合法: {e}") from None
+
     def load_from_file(self, filename: str):
         """从JSON文件加载操作记录"""
         try:
-            with open(filename, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            self.screen_width = data.get("screen_width", 1920)
-            self.screen_height = data.get("screen_height", 1080)
-            self.start_time = data.get("start_time")
-
-            self.operations = []
-            for op_data in data.get("operations", []):
-                operation = OperationData(
-                    type=op_data["type"],
-                    timestamp=op_data["timestamp"],
-                    mouse_action=op_data.get("mouse_action"),
-                    mouse_button=op_data.get("mouse_button"),
-                    mouse_event=op_data.get("mouse_event"),
-                    pos_x=op_data.get("pos_x"),
-                    pos_y=op_data.get("pos_y"),
-                    scroll=op_data.get("scroll"),
-                    key=op_data.get("key"),
-                    key_event=op_data.get("key_event"),
-                )
-                self.operations.append(operation)
+            data = self._read_json(filename)
+            self.screen_width, self.screen_height, self.start_time, self.operations = self._parse_json(data)
+
+            log.info(f"操作记录已从 {filename} 加载，共 {len(self.operations)} 个操作")
+            return True
+
+        except Exception as e:
+            log.error(f"加载操作记录失败: {e}")
+            return False
+
+    # ==================== NDJSON 流式读写 ====================
+
+    def save_to_file_ndjson(self, filename: str):
+        """以 NDJSON 格式保存：首行为屏幕尺寸等元数据，之后每行一个操作，逐行写出"""
+        self._drain()
+        try:
+            Path(filename).parent.mkdir(parents=True, exist_ok=True)
+            header = {
+                "screen_width": self.screen_width,
+                "screen_height": self.screen_height,
+                "start_time": self.start_time,
+            }
+            with open(filename, "wb") as f:
+                f.write(_dumps_line(header) + b"\n")
+                for op in self.operations:
+                    f.write(_dumps_line(op) + b"\n")
+
+            log.info(f"操作记录已保存到: {filename}")
+            return True
+
+        except Exception as e:
+            log.error(f"保存操作记录失败: {e}")
+            return False
+
+    @classmethod
+    def _read_ndjson(cls, filename: str) -> tuple[int, int, Optional[float], list[OperationData]]:
+        """逐行解析 NDJSON 文件，返回值与 _parse_json 相同"""
+        with open(filename, "rb") as f:
+            header = _loads_line(f.readline() or b"{}")
+            operations = [_op_from_dict(_loads_line(line)) for line in f if line.strip()]
+        cls.validate(operations)
+        return (
+            header.get("screen_width", 1920),
+            header.get("screen_height", 1080),
+            header.get("start_time"),
+            operations,
+        )
+
+    def load_from_file_ndjson(self, filename: str):
+        """从 NDJSON 文件加载操作记录"""
+        try:
+            self.screen_width, self.screen_height, self.start_time, self.operations = self._read_ndjson(filename)
 
             log.info(f"操作记录已从 {filename} 加载，共 {len(self.operations)} 个操作")
             return True
@@ -266,11 +474,12 @@ class OperationRecorder:
     @property
     def operation_count(self) -> int:
         """获取操作数量"""
+        self._drain()
         return len(self.operations)
 
     @property
     def recording_duration(self) -> float:
         """获取录制时长（秒）"""
         if self.start_time and self.is_recording:
-            return time.time() - self.start_time
+            return time.monotonic() - self._start_mono
         return 0.0
@@ -1,4 +1,3 @@
-# __init__.py
-from .core import SimpleLogger, create_logger
+from .core import SimpleLogger, create_logger, lazy_debug, lazy_log
 
-__all__ = ["SimpleLogger", "create_logger"]
+__all__ = ["SimpleLogger", "create_logger", "lazy_debug", "lazy_log"]
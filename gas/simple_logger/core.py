@@ -1,31 +1,57 @@
 # core.py
+import atexit
+import copy
 import json
 import logging
 import logging.config
 import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, Optional
 from importlib.metadata import version as get_package_version, PackageNotFoundError
 
 import toml
 
-from .handlers import TimestampRotatingFileHandler  # 如果分文件的话
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时回退到标准库 json
+    orjson = None
+
+from .handlers import CachingFormatter, TimestampRotatingFileHandler  # 如果分文件的话
 
 # 如果单文件，直接把 TimestampRotatingFileHandler 放在上面
 
 
 logging.TimestampRotatingFileHandler = TimestampRotatingFileHandler
+logging.CachingFormatter = CachingFormatter
+
+# 本进程中已确认存在的日志目录，重复创建 SimpleLogger 时跳过 makedirs
+_created_dirs: set[str] = set()
+
+
+def console_enabled() -> bool:
+    """是否输出到控制台
+
+    只有 stdout 为 None（pythonw 启动、没有控制台）时才跳过控制台 handler；
+    stdout 被重定向到文件或管道时照常输出。设置 GAS_LOG_CONSOLE=0 可显式关闭
+    """
+    if sys.stdout is None:
+        return False
+    return os.environ.get("GAS_LOG_CONSOLE") != "0"
 
 
-class ExactLevelFilter(logging.Filter):
-    """只允许精确匹配的日志级别通过"""
+def exact_level_filter(level: int):
+    """只允许精确匹配的日志级别通过
+
+    logging 支持直接把可调用对象作为过滤器，闭包比 Filter 子类少一次方法查找和属性访问
+    """
 
-    def __init__(self, level: int):
-        super().__init__()
-        self.level = level
+    def _filter(record) -> bool:
+        return record.levelno == level
 
-    def filter(self, record):
-        return record.levelno == self.level
+    return _filter
 
 
 class SimpleLogger:
@@ -37,6 +63,10 @@ class SimpleLogger:
     - 项目隔离（不同项目不同日志目录、不同 logger 名称）
     """
 
+    # 按 (路径, 修改时间) 缓存解析结果，文件未变化时不再重复读取和解析
+    _prefix_cache: Dict[tuple, str] = {}
+    _config_cache: Dict[tuple, Dict[str, Any]] = {}
+
     def __init__(
         self,
         project_name: str = "app",
@@ -57,6 +87,9 @@ class SimpleLogger:
         self.log_dir = os.path.abspath(log_dir)
         self.config_file = config_file or os.path.join(self.log_dir, "logging_config.json")
         self.pyproject_file = pyproject_file
+        # 文件 handler 在后台线程中写入，调用方只需入队
+        self._listener: Optional[QueueListener] = None
+        atexit.register(self._stop_listener)
 
         self._ensure_log_dirs()
         self._ensure_config_file_exists(initial_level)
@@ -74,6 +107,19 @@ class SimpleLogger:
         其次尝试读取 pyproject.toml（仅用于本地开发）
         最后退回 project_name
         """
+        mtime = None
+        if self.pyproject_file:
+            try:
+                mtime = os.path.getmtime(self.pyproject_file)
+            except OSError:
+                pass
+        key = (self.project_name, self.pyproject_file, mtime)
+        prefix = self._prefix_cache.get(key)
+        if prefix is None:
+            prefix = self._prefix_cache[key] = self._read_app_prefix()
+        return prefix
+
+    def _read_app_prefix(self) -> str:
         # 方法1：优先从已安装包的元数据读取（打包发布后可用）
         try:
             pkg_version = get_package_version(self.project_name)
@@ -98,7 +144,11 @@ class SimpleLogger:
     def _ensure_log_dirs(self):
         dirs = ["debug", "info", "warn", "error"]
         for d in dirs:
-            os.makedirs(os.path.join(self.log_dir, d), exist_ok=True)
+            path = os.path.normpath(os.path.join(self.log_dir, d))
+            if path in _created_dirs:
+                continue
+            os.makedirs(path, exist_ok=True)
+            _created_dirs.add(path)
 
     def _get_default_config(self, level: str = "DEBUG") -> Dict[str, Any]:
         prefix = self._get_app_prefix()
@@ -112,7 +162,10 @@ class SimpleLogger:
             "version": 1,
             "disable_existing_loggers": False,
             "formatters": {
-                "default": {"format": f"{prefix} - %(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s"}
+                "default": {
+                    "class": "logging.CachingFormatter",
+                    "format": f"{prefix} - %(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s",
+                }
             },
             "handlers": {
                 "console": {
@@ -172,33 +225,95 @@ class SimpleLogger:
             print(f"📝 创建默认日志配置文件: {self.config_file}")
             default_config = self._get_default_config(initial_level)
             os.makedirs(os.path.dirname(self.config_file), exist_ok=True)
+            self._write_config(default_config)
+        # 解析结果保存在实例上，之后的 setup / 级别查询和修改都不再读文件，需要时通过 reload_config 重新读取
+        try:
+            self._config: Dict[str, Any] = copy.deepcopy(self._read_config())
+        except Exception as e:
+            # 留空配置，_setup_logging 会回退到 basicConfig
+            print(f"❌ 日志配置读取失败: {e}")
+            self._config = {}
+
+    def _write_config(self, config: Dict[str, Any]):
+        """写入配置文件，优先使用 orjson 一次性序列化为字节"""
+        if orjson is not None:
+            data = orjson.dumps(config, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+            with open(self.config_file, "wb") as f:
+                f.write(data)
+        else:
             with open(self.config_file, "w", encoding="utf-8") as f:
-                json.dump(default_config, f, indent=4, ensure_ascii=False)
+                json.dump(config, f, indent=4, ensure_ascii=False)
+
+    def _read_config(self) -> Dict[str, Any]:
+        """读取配置文件（按修改时间缓存），返回值为共享对象，需要修改时先复制"""
+        key = (self.config_file, os.path.getmtime(self.config_file))
+        config = self._config_cache.get(key)
+        if config is None:
+            # 一次读入字节再解析：orjson 直接解析 UTF-8 字节，json.loads 也接受 bytes
+            with open(self.config_file, "rb") as f:
+                data = f.read()
+            config = self._config_cache[key] = orjson.loads(data) if orjson is not None else json.loads(data)
+        return config
+
+    def _invalidate_config(self):
+        for key in [k for k in self._config_cache if k[0] == self.config_file]:
+            del self._config_cache[key]
 
     def _setup_logging(self):
         try:
-            with open(self.config_file, "r", encoding="utf-8") as f:
-                config = json.load(f)
+            # dictConfig 会修改传入的字典，这里使用副本
+            config = copy.deepcopy(self._config)
 
             # 重新加载前缀（万一 pyproject 更新了）
             prefix = self._get_app_prefix()
             config["formatters"]["default"]["format"] = config["formatters"]["default"]["format"].split(" - ", 1)[-1]
             config["formatters"]["default"]["format"] = f"{prefix} - {config['formatters']['default']['format']}"
-
+            # 旧版本生成的配置文件没有 class 字段，这里统一使用带缓存的 formatter
+            config["formatters"]["default"]["class"] = "logging.CachingFormatter"
+
+            # 配置文件里始终保留 console，是否启用按当前运行环境决定
+            if console_enabled():
+                # 被重定向时 stdout 默认是块缓冲，改为按行刷新，日志能及时出现且无需逐条 flush
+                try:
+                    if not sys.stdout.isatty() and hasattr(sys.stdout, "reconfigure"):
+                        sys.stdout.reconfigure(line_buffering=True)
+                except (AttributeError, ValueError):
+                    pass
+            else:
+                config["handlers"].pop("console", None)
+                for logger_config in config.get("loggers", {}).values():
+                    handlers = logger_config.get("handlers")
+                    if handlers and "console" in handlers:
+                        logger_config["handlers"] = [h for h in handlers if h != "console"]
+
+            # 先停掉旧的监听线程，确保旧 handler 里的日志写完后再被 dictConfig 关闭
+            self._stop_listener()
             logging.config.dictConfig(config)
 
             # 为每个文件 handler 添加精确级别过滤器
             logger_name = f"simple_logger.{self.project_name}"
-            for handler in logging.getLogger(logger_name).handlers:
+            logger = logging.getLogger(logger_name)
+            file_handlers = []
+            for handler in logger.handlers:
                 if isinstance(handler, TimestampRotatingFileHandler):
                     if "debug.log" in handler.baseFilename:
-                        handler.addFilter(ExactLevelFilter(logging.DEBUG))
+                        handler.addFilter(exact_level_filter(logging.DEBUG))
                     elif "info.log" in handler.baseFilename:
-                        handler.addFilter(ExactLevelFilter(logging.INFO))
+                        handler.addFilter(exact_level_filter(logging.INFO))
                     elif "warn.log" in handler.baseFilename:
-                        handler.addFilter(ExactLevelFilter(logging.WARNING))
+                        handler.addFilter(exact_level_filter(logging.WARNING))
                     elif "error.log" in handler.baseFilename:
-                        handler.addFilter(ExactLevelFilter(logging.ERROR))
+                        handler.addFilter(exact_level_filter(logging.ERROR))
+                    file_handlers.append(handler)
+
+            # 文件 handler 移到 QueueListener 线程中执行，logger 上只保留一个 QueueHandler
+            if file_handlers:
+                for handler in file_handlers:
+                    logger.removeHandler(handler)
+                log_queue = queue.SimpleQueue()
+                self._listener = QueueListener(log_queue, *file_handlers, respect_handler_level=True)
+                self._listener.start()
+                logger.addHandler(QueueHandler(log_queue))
 
         except Exception as e:
             print(f"❌ 日志配置加载失败: {e}")
@@ -207,6 +322,12 @@ class SimpleLogger:
                 format=f"{self._get_app_prefix()} - %(asctime)s - %(levelname)s - %(message)s",
             )
 
+    def _stop_listener(self):
+        """停止后台写日志线程，队列中剩余的日志会先全部写完"""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
     def update_level(self, new_level: str) -> bool:
         new_level = new_level.upper()
         valid = {"DEBUG", "INFO", "WARNING", "ERROR"}
@@ -215,17 +336,18 @@ class SimpleLogger:
             return False
 
         try:
-            with open(self.config_file, "r", encoding="utf-8") as f:
-                config = json.load(f)
+            config = self._config
 
             logger_key = f"simple_logger.{self.project_name}"
             if logger_key in config["loggers"]:
                 config["loggers"][logger_key]["level"] = new_level
 
-            with open(self.config_file, "w", encoding="utf-8") as f:
-                json.dump(config, f, indent=4, ensure_ascii=False)
+            self._write_config(config)
+            # 修改时间精度不足时可能与旧缓存键相同，写入后主动失效
+            self._invalidate_config()
 
-            self._setup_logging()
+            # 只改级别，不重新 dictConfig，避免关闭并重新打开所有日志文件
+            logging.getLogger(logger_key).setLevel(new_level)
             print(f"✅ [{self.project_name}] 日志级别更新为: {new_level}")
             return True
         except Exception as e:
@@ -234,12 +356,32 @@ class SimpleLogger:
 
     def get_current_level(self) -> str:
         try:
-            with open(self.config_file, "r", encoding="utf-8") as f:
-                config = json.load(f)
-            return config["loggers"][f"simple_logger.{self.project_name}"]["level"]
+            return self._config["loggers"][f"simple_logger.{self.project_name}"]["level"]
         except Exception:
             return "UNKNOWN"
 
+    def reload_config(self):
+        """重新读取配置文件并应用（手动修改了配置文件后调用）"""
+        self._config = copy.deepcopy(self._read_config())
+        self._setup_logging()
+
+
+def lazy_log(logger: logging.Logger, level: int, build: Callable[[], str]):
+    """仅在 logger 开启了 level 级别时才调用 build() 生成日志内容
+
+    适用于消息需要额外计算（拼接大对象、调用耗时函数）的场景；普通参数直接用
+    logger.debug("... %s", value) 的惰性格式化即可
+    """
+    if logger.isEnabledFor(level):
+        # stacklevel=2 使日志中的文件名和行号指向调用方
+        logger.log(level, build(), stacklevel=2)
+
+
+def lazy_debug(logger: logging.Logger, build: Callable[[], str]):
+    """lazy_log 的 DEBUG 级别快捷方式"""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(build(), stacklevel=2)
+
 
 # 推荐的工厂函数（放在 __init__.py 中方便导入）
 def create_logger(
@@ -1,39 +1,138 @@
 # handlers.py
+import logging
 import os
+import threading
+import time
+import weakref
 from datetime import datetime
 from logging.handlers import RotatingFileHandler
 
+# 所有带缓冲的 handler，由同一个后台线程定时刷盘
+_buffered_handlers = weakref.WeakSet()
+_flush_thread: threading.Thread | None = None
+_flush_thread_lock = threading.Lock()
+FLUSH_INTERVAL = 0.2  # 秒
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        for handler in list(_buffered_handlers):
+            handler.flush()
+
+
+def _register_for_flush(handler):
+    global _flush_thread
+    _buffered_handlers.add(handler)
+    with _flush_thread_lock:
+        if _flush_thread is None:
+            _flush_thread = threading.Thread(target=_flush_loop, name="log-flush", daemon=True)
+            _flush_thread.start()
+
+
+class CachingFormatter(logging.Formatter):
+    """
+    把格式化结果缓存在 record 上：同一条日志经过多个共用此 formatter 的 handler 时只格式化一次
+    （dictConfig 对同名 formatter 只创建一个实例，缓存按实例区分，不同格式之间互不影响）
+    """
+
+    def format(self, record):
+        cached = record.__dict__.get("_cached_fmt")
+        if cached is not None and cached[0] is self:
+            return cached[1]
+        text = super().format(record)
+        record._cached_fmt = (self, text)
+        return text
+
 
 class TimestampRotatingFileHandler(RotatingFileHandler):
     """
     自定义 RotatingFileHandler：
     - 旋转时重命名为 filename_YYYY-MM-DD_HH-MM-SS.log
     - 自动清理超过 backupCount 的旧备份文件（按时间排序）
+    - 日志先写入内存缓冲，累计到 flush_bytes 或每 FLUSH_INTERVAL 秒才写入文件；
+      ERROR 及以上级别立即写入，进程随后崩溃（原生库段错误、os._exit）时也不会丢失
     """
 
+    def __init__(self, *args, flush_bytes: int = 64 * 1024, **kwargs):
+        # 父类构造时可能就会调用 _open，缓冲区需要先准备好
+        self._buf = bytearray()
+        self._flush_bytes = flush_bytes
+        super().__init__(*args, **kwargs)
+        _register_for_flush(self)
+
+    def _open(self):
+        # 以二进制追加模式打开，emit 中自行编码，省去文本层的逐条处理
+        return open(self.baseFilename, "ab")
+
+    def _write_buffer(self):
+        """把缓冲写入文件（调用方需持有 self.lock）"""
+        if self._buf:
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(self._buf)
+            self._buf.clear()
+
+    def emit(self, record):
+        try:
+            data = (self.format(record) + self.terminator).encode(self.encoding or "utf-8")
+            if self.stream is None:
+                self.stream = self._open()
+            if self.maxBytes > 0:
+                pos = self.stream.tell() + len(self._buf)
+                if pos and pos + len(data) >= self.maxBytes:
+                    self.doRollover()
+            self._buf += data
+            if record.levelno >= logging.ERROR:
+                self._write_buffer()
+                self.stream.flush()
+            elif len(self._buf) >= self._flush_bytes:
+                self._write_buffer()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        self.acquire()
+        try:
+            self._write_buffer()
+            if self.stream is not None and hasattr(self.stream, "flush"):
+                self.stream.flush()
+        finally:
+            self.release()
+
+    def close(self):
+        _buffered_handlers.discard(self)
+        super().close()
+
     def doRollover(self):
         if self.stream:
+            self._write_buffer()
             self.stream.close()
             self.stream = None
 
         timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        # 用 splitext 拆扩展名，不依赖扩展名恰好是 4 个字符
+        base_no_ext, ext = os.path.splitext(self.baseFilename)
+        ext = ext or ".log"
+        dir_name, base_name = os.path.split(base_no_ext)  # 如 "debug"
 
         if os.path.exists(self.baseFilename):
-            backup_name = f"{self.baseFilename[:-4]}_{timestamp}.log"
-            os.replace(self.baseFilename, backup_name)
+            os.replace(self.baseFilename, f"{base_no_ext}_{timestamp}{ext}")
 
         # 清理旧备份
-        dir_name = os.path.dirname(self.baseFilename)
         if not os.path.isdir(dir_name):
             return
 
-        base_name = os.path.basename(self.baseFilename[:-4])  # 如 "debug"
-
-        backups = [f for f in os.listdir(dir_name) if f.startswith(base_name + "_") and f.endswith(".log")]
-        backups.sort(reverse=True)  # 最新在前
+        prefix = base_name + "_"
+        with os.scandir(dir_name) as it:
+            backups = [e for e in it if e.name.startswith(prefix) and e.name.endswith(ext)]
+        # 文件名中的时间戳可直接按字典序排序，最新在前
+        backups.sort(key=lambda e: e.name, reverse=True)
 
         for old in backups[self.backupCount :]:
-            os.remove(os.path.join(dir_name, old))
+            os.unlink(old.path)
 
         if not self.delay:
             self.stream = self._open()
@@ -1,15 +1,24 @@
-"""工具模块"""
-
-from . import img_util
-from . import file_util
-from . import dxcam_util
-from . import hwnd_util
-from . import keymouse_util
-from . import mss_util
-from . import screenshot_util
-from . import windows_util
-from . import wrap_util
-from . import onnx_util
+"""工具模块
+
+子模块按需加载（PEP 562）：``import gas.util`` 不会连带导入 numpy、cv2、dxcam 等重依赖，
+首次访问 ``gas.util.xxx_util`` 时才真正导入对应子模块
+"""
+
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from . import img_util
+    from . import file_util
+    from . import dxcam_util
+    from . import hwnd_util
+    from . import keymouse_util
+    from . import mss_util
+    from . import screenshot_util
+    from . import windows_util
+    from . import wrap_util
+    from . import onnx_util
+    from . import time_util
 
 __all__ = [
     "img_util",
@@ -22,4 +31,18 @@ __all__ = [
     "windows_util",
     "wrap_util",
     "onnx_util",
+    "time_util",
 ]
+
+
+def __getattr__(name):
+    if name in __all__:
+        module = importlib.import_module(f".{name}", __name__)
+        # 写回模块字典，之后的访问不再经过 __getattr__
+        globals()[name] = module
+        return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
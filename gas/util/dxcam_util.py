@@ -11,6 +11,13 @@ from gas.logger import get_logger
 logger = get_logger()
 
 
+# (device_idx, output_idx, output_color) -> DXCamera；每个 D3D 设备/输出只创建一次，重复创建会浪费显卡资源
+# dxcam 内部同样按设备/输出只保留一个实例，因此 region、max_buffer_len 不能作为区分实例的 key
+_CAMERAS: dict[tuple, DXCamera] = {}
+# 同一 key -> 首次创建时的 (region, max_buffer_len)，用于检查复用时参数是否一致
+_CAMERA_PARAMS: dict[tuple, tuple] = {}
+
+
 def create_camera(
     device_idx: int = 0,
     output_idx: int = None,
@@ -18,13 +25,36 @@ def create_camera(
     output_color: str = "BGR",
     max_buffer_len: int = 64,
 ) -> DXCamera:
-    camera = dxcam.create(
-        device_idx=device_idx,
-        output_idx=output_idx,
-        region=region,
-        output_color=output_color,
-        max_buffer_len=max_buffer_len,
-    )
+    """
+    获取 DXCamera，同一设备、输出和颜色格式复用同一个实例
+    region、max_buffer_len 只在首次创建时生效，复用实例时参数不一致会记录 WARNING，
+    此时请在 grab(region=...) / start_stream(region=...) 中指定区域
+    """
+    key = (device_idx, output_idx, output_color)
+    camera = _CAMERAS.get(key)
+    if camera is None:
+        camera = _CAMERAS[key] = dxcam.create(
+            device_idx=device_idx,
+            output_idx=output_idx,
+            region=region,
+            output_color=output_color,
+            max_buffer_len=max_buffer_len,
+        )
+        _CAMERA_PARAMS[key] = (region, max_buffer_len)
+        return camera
+
+    created_region, created_buffer_len = _CAMERA_PARAMS[key]
+    if region is not None and tuple(region) != tuple(created_region or ()):
+        logger.warning(
+            "复用已创建的 DXCamera %s，region 参数 %s 与创建时的 %s 不一致，已忽略", key, region, created_region
+        )
+    if max_buffer_len != created_buffer_len:
+        logger.warning(
+            "复用已创建的 DXCamera %s，max_buffer_len 参数 %s 与创建时的 %s 不一致，已忽略",
+            key,
+            max_buffer_len,
+            created_buffer_len,
+        )
     return camera
 
 
@@ -32,6 +62,33 @@ def screenshot(camera: DXCamera, region: tuple[int, int, int, int] | None = None
     return camera.grab(region=region)
 
 
+def start_stream(
+    camera: DXCamera, region: tuple[int, int, int, int] | None = None, target_fps: int = 60, video_mode: bool = True
+):
+    """
+    开启连续截图：dxcam 后台线程按 target_fps 把帧写入预分配的环形缓冲区（max_buffer_len 帧），
+    高频循环中用 latest_frame 取帧，省去每次 grab 时的 D3D 帧获取和新数组分配
+    video_mode=True 时画面无变化也会重复输出上一帧，latest_frame 不会一直阻塞
+    """
+    if camera.is_capturing:
+        return
+    camera.start(region=region, target_fps=target_fps, video_mode=video_mode)
+
+
+def latest_frame(camera: DXCamera) -> np.ndarray:
+    """
+    获取连续截图中最新的一帧（需先 start_stream），没有新帧时阻塞等待
+    返回的数组可能引用环形缓冲区，会被后续帧覆盖，需要保留时请自行 copy
+    """
+    return camera.get_latest_frame()
+
+
+def stop_stream(camera: DXCamera):
+    """停止连续截图，释放后台线程"""
+    if camera.is_capturing:
+        camera.stop()
+
+
 if __name__ == "__main__":
     hwnd = hwnd_util.get_hwnd()
     test_camera = create_camera()
@@ -1,8 +1,11 @@
 import ctypes
+import functools
+import logging
 import re
+import threading
 import time
-from ctypes import windll
-from typing import List, Tuple, Optional, Callable
+from ctypes import windll, wintypes
+from typing import List, Tuple, Optional, Callable, Pattern
 from pathlib import Path
 
 import psutil
@@ -30,6 +33,7 @@ OFFICIAL_LOGIN_HWND_TITLE = ""
 # b服登录窗口
 BILIBILI_LOGIN_HWND_CLASS_NAME = "CLoginDlg_P_8340_\\d{10}"  # CLoginDlg_P_8340_1720374432
 BILIBILI_LOGIN_HWND_TITLE = "bilibili游戏 登录_弹框"
+BILIBILI_LOGIN_CLASS_RE = re.compile(BILIBILI_LOGIN_HWND_CLASS_NAME)
 # UE4-Client崩溃窗口
 UE4_CLIENT_HWND_CLASS_NAME = "#32770"
 UE4_CLIENT_HWND_TITLE = "UE4-Client Game已崩溃，即将关闭"
@@ -37,8 +41,31 @@ UE4_CLIENT_HWND_TITLE = "UE4-Client Game已崩溃，即将关闭"
 # dpi
 STANDARD_DPI = 96  # 96 是标准 DPI
 
+# 直接通过 ctypes 调用的 user32 函数，预先声明签名避免每次调用时的参数推断
+_user32 = ctypes.WinDLL("user32", use_last_error=True)
+_user32.GetWindowRect.argtypes = [wintypes.HWND, ctypes.POINTER(wintypes.RECT)]
+_user32.GetWindowRect.restype = wintypes.BOOL
+_user32.GetClientRect.argtypes = [wintypes.HWND, ctypes.POINTER(wintypes.RECT)]
+_user32.GetClientRect.restype = wintypes.BOOL
+_user32.GetWindow.argtypes = [wintypes.HWND, wintypes.UINT]
+_user32.GetWindow.restype = wintypes.HWND
+GW_HWNDNEXT = 2
+GW_CHILD = 5
+# 遍历过程中窗口被创建/销毁时 GetWindow 链可能成环或无限延长，单个窗口的直接子窗口数超过该值即停止
+MAX_CHILD_WINDOWS = 10000
 
-@dataclass
+# ctypes 调用期间会释放 GIL，RECT 缓冲按线程复用
+_rect_local = threading.local()
+
+
+def _rect_buf() -> wintypes.RECT:
+    rect = getattr(_rect_local, "rect", None)
+    if rect is None:
+        rect = _rect_local.rect = wintypes.RECT()
+    return rect
+
+
+@dataclass(slots=True)
 class WindowInfo:
     """窗口信息结构体"""
 
@@ -84,28 +111,31 @@ def list_all_windows() -> List[WindowInfo]:
     try:
         windows_dict = {}  # hwnd -> WindowInfo 映射
         root_windows = []  # 根窗口列表
-        all_hwnds = set()  # 所有已处理的 hwnd
+
+        # 枚举回调中会对每个窗口调用，先绑定到局部变量
+        get_text = win32gui.GetWindowText
+        get_class = win32gui.GetClassName
+        get_long = win32gui.GetWindowLong
+        is_visible_fn = win32gui.IsWindowVisible
+        get_window = _user32.GetWindow
+        gwl_style = win32con.GWL_STYLE
 
         def _create_window_info(hwnd):
             """创建窗口信息对象"""
-            if hwnd in all_hwnds:
-                return None
-            all_hwnds.add(hwnd)
-
             try:
-                title = win32gui.GetWindowText(hwnd)
-                class_name = win32gui.GetClassName(hwnd)
+                title = get_text(hwnd)
+                class_name = get_class(hwnd)
 
                 # 过滤无标题无类名的窗口
                 if not title and not class_name:
                     return None
 
                 # 获取窗口信息
-                style = win32gui.GetWindowLong(hwnd, win32con.GWL_STYLE)
-                is_visible = win32gui.IsWindowVisible(hwnd)
+                style = get_long(hwnd, gwl_style)
+                is_visible = is_visible_fn(hwnd)
 
                 try:
-                    rect = win32gui.GetWindowRect(hwnd)
+                    rect = get_window_rect(hwnd)
                     width = rect[2] - rect[0]
                     height = rect[3] - rect[1]
                     if width <= 0 or height <= 0 or width > 10000 or height > 10000:
@@ -120,7 +150,7 @@ def list_all_windows() -> List[WindowInfo]:
                     position=(rect[0], rect[1]),
                     size=(width, height),
                     class_name=class_name,
-                    is_child=False,  # 会在构建树时修正
+                    is_child=False,
                     parent=None,
                     is_visible=is_visible,
                     style=style,
@@ -130,38 +160,6 @@ def list_all_windows() -> List[WindowInfo]:
                 print(f"创建窗口信息失败 {hwnd}: {e}")
                 return None
 
-        def _enum_window_tree(hwnd, parent_hwnd=None):
-            """递归枚举窗口树"""
-            if hwnd in windows_dict:
-                return windows_dict[hwnd]
-
-            window_info = _create_window_info(hwnd)
-            if not window_info:
-                return None
-
-            windows_dict[hwnd] = window_info
-
-            # 设置父子关系
-            if parent_hwnd and parent_hwnd in windows_dict:
-                parent_info = windows_dict[parent_hwnd]
-                window_info.parent = parent_info
-                window_info.is_child = True
-                parent_info.children.append(window_info)
-
-            # 枚举子窗口
-            child_hwnds = []
-
-            def enum_child_proc(child_hwnd, _):
-                child_hwnds.append(child_hwnd)
-                return True
-
-            win32gui.EnumChildWindows(hwnd, enum_child_proc, None)
-
-            for child_hwnd in child_hwnds:
-                _enum_window_tree(child_hwnd, hwnd)
-
-            return window_info
-
         # 枚举所有顶级窗口
         top_level_hwnds = []
 
@@ -171,11 +169,48 @@ def list_all_windows() -> List[WindowInfo]:
 
         win32gui.EnumWindows(enum_top_windows_proc, None)
 
-        # 构建窗口树
         for hwnd in top_level_hwnds:
-            window_info = _enum_window_tree(hwnd)
-            if window_info and not window_info.parent:  # 只有没有父窗口的才是根窗口
-                root_windows.append(window_info)
+            if hwnd in windows_dict:
+                continue
+            root_info = _create_window_info(hwnd)
+            if not root_info:
+                continue
+            windows_dict[hwnd] = root_info
+            root_windows.append(root_info)
+
+            # 用 GW_CHILD / GW_HWNDNEXT 逐层遍历直接子窗口，入栈时就知道父窗口，
+            # 不再需要对每个窗口调用 GetParent；先序顺序与 EnumChildWindows 一致
+            # 栈元素: (hwnd, 挂载到的父窗口信息)，直接父窗口被过滤掉时挂到最近的保留祖先下
+            # visited 记录已遍历过的句柄（包括被过滤掉的窗口），防止链表成环时重复遍历
+            stack = [(hwnd, root_info)]
+            visited = {hwnd}
+            while stack:
+                parent_hwnd, parent_info = stack.pop()
+                children = []
+                child_hwnd = get_window(parent_hwnd, GW_CHILD)
+                while child_hwnd:
+                    if child_hwnd in visited:
+                        break
+                    if len(children) >= MAX_CHILD_WINDOWS:
+                        logger.warning("窗口 %s 的子窗口超过 %d 个，停止遍历", parent_hwnd, MAX_CHILD_WINDOWS)
+                        break
+                    visited.add(child_hwnd)
+                    children.append(child_hwnd)
+                    child_hwnd = get_window(child_hwnd, GW_HWNDNEXT)
+
+                pending = []
+                for child_hwnd in children:
+                    if child_hwnd in windows_dict:
+                        continue
+                    window_info = _create_window_info(child_hwnd)
+                    if window_info:
+                        windows_dict[child_hwnd] = window_info
+                        window_info.parent = parent_info
+                        window_info.is_child = True
+                        parent_info.children.append(window_info)
+                    pending.append((child_hwnd, window_info or parent_info))
+                # 逆序入栈保证按原顺序出栈
+                stack.extend(reversed(pending))
 
         return root_windows
 
@@ -185,37 +220,56 @@ def list_all_windows() -> List[WindowInfo]:
 
 
 def find_in_children(windows: List[WindowInfo], call: Callable[[WindowInfo], bool]) -> Optional[WindowInfo]:
-    """在子窗口中递归查找满足条件的窗口"""
-    for window in windows:
+    """在子窗口中深度优先查找满足条件的窗口（先序，与递归写法的查找顺序一致）"""
+    # 显式栈代替递归，逆序入栈保证按原顺序出栈
+    stack = windows[::-1]
+    while stack:
+        window = stack.pop()
         if call(window):
             return window
-        result = find_in_children(window.children, call)
-        if result:
-            return result
+        stack.extend(reversed(window.children))
     return None
 
 
+# {pid: 进程名} 快照，PROC_CACHE_TTL 秒内重复查询直接复用，避免轮询时反复遍历全部进程
+PROC_CACHE_TTL = 0.5
+_proc_cache: tuple[float, dict[int, str]] = (0.0, {})
+
+
+def _get_process_names() -> dict[int, str]:
+    global _proc_cache
+    ts, names = _proc_cache
+    now = time.monotonic()
+    if now - ts >= PROC_CACHE_TTL or not names:
+        names = {proc.info["pid"]: proc.info["name"] for proc in psutil.process_iter(["name", "pid"])}
+        _proc_cache = (now, names)
+    return names
+
+
 def get_pid_by_exe_name(exe_name: str):
-    for proc in psutil.process_iter(["name", "pid"]):
-        if proc.info["name"] == exe_name:
-            pro_pid = proc.info["pid"]
-            # print(f"pid: {pro_pid}")
-            return pro_pid
-    return None
+    return next((pid for pid, name in _get_process_names().items() if name == exe_name), None)
+
+
+def _enum_hwnds_for_pid(target_pid: int) -> list[int]:
+    """枚举属于指定进程的顶级窗口句柄"""
+    result = []
+    get_pid = win32process.GetWindowThreadProcessId
+
+    def callback(hwnd, _):
+        if get_pid(hwnd)[1] == target_pid:
+            result.append(hwnd)
+        return True
+
+    win32gui.EnumWindows(callback, None)
+    return result
 
 
 def get_hwnd_by_exe_name(exe_name: str) -> list | None:
     ge_pid = get_pid_by_exe_name(exe_name)
     if ge_pid is None:
         return None
-    windows_list = list_all_windows()
-    rt_hwnd_list: list = []
-    for windows in windows_list:
-        _, found_pid = win32process.GetWindowThreadProcessId(windows.hwnd)
-        if found_pid == ge_pid:
-            rt_hwnd_list.append(windows.hwnd)
-
-    return rt_hwnd_list
+    # 直接在 EnumWindows 回调中按 pid 过滤，不再构建完整的窗口树
+    return _enum_hwnds_for_pid(ge_pid)
 
 
 def get_exe_path_from_hwnd(hwnd: int) -> str | None:
@@ -232,44 +286,101 @@ def get_exe_path_from_hwnd(hwnd: int) -> str | None:
         return None
 
 
-def _find_all_windows(class_name=None, titles=None):
-    result = []
+def _compile_class_match(class_name: str | Pattern | None):
+    """类名匹配函数：字符串精确匹配，预编译正则 fullmatch，None 表示不限制"""
+    if class_name is None:
+        return None
+    if isinstance(class_name, re.Pattern):
+        return class_name.fullmatch
+    return class_name.__eq__
 
-    def check_window(hwnd):
-        if not win32gui.IsWindowVisible(hwnd):
-            return False
 
-        window_class = win32gui.GetClassName(hwnd)
-        window_text = win32gui.GetWindowText(hwnd)
+def _find_all_windows(
+    class_name: str | Pattern | None = None,
+    titles=None,
+    parent_class: str | Pattern | None = None,
+    parent_titles=None,
+):
+    """查找类名和标题都匹配的可见窗口
 
-        class_match = class_name is None or window_class == class_name
-        title_match = titles is None or window_text in titles
+    class_name 可以是字符串（精确匹配）或预编译的正则（fullmatch）
 
-        return class_match and title_match
+    先只展开可能的父窗口：类名或标题至少命中其一的顶层窗口，以及符合 parent_class / parent_titles
+    提示的顶层窗口（如模拟器外框），避免枚举桌面上所有无关程序的子窗口；
+    这一轮没有找到时再展开其余所有可见顶层窗口，类名、标题都与外框不同的内嵌渲染窗口也能找到
+    """
+    result = []
+    # 标题集合和类名匹配方式在枚举前确定，回调中只做 O(1) 判断
+    titles_set = frozenset(titles) if titles is not None else None
+    match_class = _compile_class_match(class_name)
+    parent_titles_set = frozenset(parent_titles) if parent_titles is not None else None
+    match_parent_class = _compile_class_match(parent_class)
+    has_parent_hint = match_parent_class is not None or parent_titles_set is not None
+
+    is_visible = win32gui.IsWindowVisible
+    get_class = win32gui.GetClassName
+    get_text = win32gui.GetWindowText
+
+    def matches(hwnd):
+        class_match = match_class is None or bool(match_class(get_class(hwnd)))
+        title_match = titles_set is None or get_text(hwnd) in titles_set
+        return class_match, title_match
+
+    def is_hinted_parent(hwnd):
+        if not has_parent_hint:
+            return False
+        class_ok = match_parent_class is None or bool(match_parent_class(get_class(hwnd)))
+        title_ok = parent_titles_set is None or get_text(hwnd) in parent_titles_set
+        return class_ok and title_ok
 
-    def callback(hwnd, _):
-        if check_window(hwnd):
-            result.append(hwnd)
+    def child_callback(child_hwnd, _):
+        if is_visible(child_hwnd) and all(matches(child_hwnd)):
+            result.append(child_hwnd)
+        return True
+
+    expanded = set()
 
-        def child_callback(child_hwnd, __):
-            if check_window(child_hwnd):
-                result.append(child_hwnd)
+    def callback(hwnd, _):
+        # 不可见的顶层窗口，其子窗口也不可见，直接跳过
+        if not is_visible(hwnd):
             return True
+        class_match, title_match = matches(hwnd)
+        if class_match and title_match:
+            result.append(hwnd)
+        if class_match or title_match or is_hinted_parent(hwnd):
+            expanded.add(hwnd)
+            win32gui.EnumChildWindows(hwnd, child_callback, None)
+        return True
 
-        win32gui.EnumChildWindows(hwnd, child_callback, None)
+    def fallback_callback(hwnd, _):
+        if hwnd not in expanded and is_visible(hwnd):
+            win32gui.EnumChildWindows(hwnd, child_callback, None)
         return True
 
     win32gui.EnumWindows(callback, None)
+    if not result:
+        win32gui.EnumWindows(fallback_callback, None)
     return result
 
 
-def get_hwnd_by_class_and_title(class_name: str, titles: list[str] | str) -> list:
+def get_hwnd_by_class_and_title(
+    class_name: str | Pattern,
+    titles: list[str] | str,
+    parent_class: str | Pattern | None = None,
+    parent_titles: list[str] | str | None = None,
+) -> list:
+    """
+    查找类名和标题匹配的窗口（含子窗口）
+    目标是内嵌在外框里的子窗口时，可以用 parent_class / parent_titles 指明外框，优先只展开外框的子窗口
+    """
     if isinstance(titles, str):
         titles = [titles]
+    if isinstance(parent_titles, str):
+        parent_titles = [parent_titles]
     windows = []
     # logger.debug("window class: %s, title: %s", class_name, titles)
     # window = win32gui.FindWindow(class_name, title)  # 只会返回一个
-    find_windows = _find_all_windows(class_name, titles)
+    find_windows = _find_all_windows(class_name, titles, parent_class, parent_titles)
     # logger.debug("windows: %s", find_windows)
     windows.extend(find_windows)
     return windows
@@ -287,7 +398,7 @@ def get_hwnd(filter_path: str | None = None, force: bool = False) -> int | None:
     :return:
     """
     if filter_path is not None:
-        logger.debug(f"get_hwnd入参: {filter_path}")
+        logger.debug("get_hwnd入参: %s", filter_path)
     hwnds = get_hwnds()
     if not hwnds:
         return None
@@ -409,34 +520,42 @@ def enable_dpi_awareness():
 # 获取窗口物理矩形
 def get_window_rect(hwnd) -> tuple[int, int, int, int]:
     """获取特定窗口的绝对坐标，左上右下，（包括标题栏、边框等非客户区"""
-    return win32gui.GetWindowRect(hwnd)
+    rect = _rect_buf()
+    if not _user32.GetWindowRect(hwnd, ctypes.byref(rect)):
+        raise ctypes.WinError(ctypes.get_last_error())
+    return rect.left, rect.top, rect.right, rect.bottom
 
 
 def get_client_rect(hwnd) -> tuple[int, int, int, int]:
     """获取特定窗口客户区的相对坐标，即内容区域（如编辑框、绘图区等），不包含非客户区（标题栏、边框等）"""
-    return win32gui.GetClientRect(hwnd)
+    rect = _rect_buf()
+    if not _user32.GetClientRect(hwnd, ctypes.byref(rect)):
+        raise ctypes.WinError(ctypes.get_last_error())
+    return rect.left, rect.top, rect.right, rect.bottom
 
 
 def get_window_wh(hwnd) -> tuple[int, int]:
     """获取特定窗口的宽高px"""
-    left, top, right, bot = win32gui.GetWindowRect(hwnd)
-    logger.debug("window rect: (%s, %s, %s, %s)", left, top, right, bot)
+    left, top, right, bot = get_window_rect(hwnd)
     width = right - left
     height = bot - top
-    logger.debug("window w, h: %d, %d", width, height)
+    # 截图循环中每帧都会调用，DEBUG 关闭时连参数元组都不构造
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("window rect: (%s, %s, %s, %s), w, h: %d, %d", left, top, right, bot, width, height)
     return width, height
 
 
 def get_client_wh(hwnd):
     """获取特定窗口客户区的宽高px"""
-    left, top, right, bot = win32gui.GetClientRect(hwnd)
-    logger.debug("client rect: (%s, %s, %s, %s)", left, top, right, bot)
+    left, top, right, bot = get_client_rect(hwnd)
     width = right - left
     height = bot - top
-    logger.debug("client w, h: %d, %d", width, height)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("client rect: (%s, %s, %s, %s), w, h: %d, %d", left, top, right, bot, width, height)
     return width, height
 
 
+@functools.lru_cache(maxsize=1)
 def get_screen_wh():
     """电脑屏幕的宽高px（分辨率）"""
     # noinspection PyUnresolvedReferences
@@ -447,8 +566,31 @@ def get_screen_wh():
     return width, height
 
 
+# hwnd -> (查询时间, 客户区屏幕坐标)；截图循环每帧都会调用，约一帧（60Hz）内复用结果
+CLIENT_RECT_TTL = 0.016
+_client_rect_cache: dict[int, tuple[float, tuple[int, int, int, int]]] = {}
+
+
+def invalidate_rect_cache(hwnd=None):
+    """主动移动或缩放窗口后调用，hwnd 为 None 时清空全部"""
+    if hwnd is None:
+        _client_rect_cache.clear()
+    else:
+        _client_rect_cache.pop(hwnd, None)
+
+
 def get_client_rect_on_screen(hwnd) -> tuple[int, int, int, int]:
-    left, top, right, bottom = win32gui.GetClientRect(hwnd)
+    now = time.monotonic()
+    cached = _client_rect_cache.get(hwnd)
+    if cached is not None and now - cached[0] < CLIENT_RECT_TTL:
+        return cached[1]
+    rect = _query_client_rect_on_screen(hwnd)
+    _client_rect_cache[hwnd] = (now, rect)
+    return rect
+
+
+def _query_client_rect_on_screen(hwnd) -> tuple[int, int, int, int]:
+    left, top, right, bottom = get_client_rect(hwnd)
     # 将客户区左上角 (0, 0) 转换为屏幕坐标
     client_point = win32gui.ClientToScreen(hwnd, (0, 0))
     client_left, client_top = client_point
@@ -475,23 +617,44 @@ def get_focus_rect_on_screen(
     )
 
 
+@functools.lru_cache(maxsize=1)
 def get_sys_dpi():
+    # 系统 DPI 在进程生命周期内不会变化
     dpi = windll.user32.GetDpiForSystem()
-    logger.debug(f"System DPI: {dpi}")
+    logger.debug("System DPI: %s", dpi)
     return dpi
 
 
+# hwnd -> (查询时间, dpi)；窗口可能被拖到其他缩放比例的显示器上，因此只短暂缓存
+WINDOW_DPI_TTL = 1.0
+_dpi_cache: dict[int, tuple[float, int]] = {}
+
+
 def get_window_dpi(hwnd):
+    now = time.monotonic()
+    cached = _dpi_cache.get(hwnd)
+    if cached is not None and now - cached[0] < WINDOW_DPI_TTL:
+        return cached[1]
     dpi = windll.user32.GetDpiForWindow(hwnd)
-    logger.debug(f"Window DPI: {dpi}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Window DPI: %s", dpi)
+    _dpi_cache[hwnd] = (now, dpi)
     return dpi
 
 
+def invalidate_dpi_cache():
+    """显示设置（分辨率、缩放）变化后调用，清空 DPI 和屏幕尺寸缓存"""
+    _dpi_cache.clear()
+    get_sys_dpi.cache_clear()
+    get_screen_wh.cache_clear()
+
+
 def set_hwnd_left_top(hwnd=None):
     logger.debug("将窗口移动至左上角")
     if hwnd is None:
         hwnd = get_hwnd()
     win32gui.SetWindowPos(hwnd, 0, 0, 0, 0, 0, win32con.SWP_NOSIZE | win32con.SWP_NOZORDER | win32con.SWP_SHOWWINDOW)
+    invalidate_rect_cache(hwnd)
 
 
 def set_hwnd_center(hwnd=None):
@@ -505,7 +668,7 @@ def set_hwnd_center(hwnd=None):
     work_height = screen_rect[3] - screen_rect[1]  # 工作区高度
 
     # 获取窗口的宽度和高度
-    window_rect = win32gui.GetWindowRect(hwnd)  # 获取窗口的矩形框
+    window_rect = get_window_rect(hwnd)  # 获取窗口的矩形框
     window_width = window_rect[2] - window_rect[0]  # 右边界 - 左边界 = 宽度
     window_height = window_rect[3] - window_rect[1]  # 下边界 - 上边界 = 高度
 
@@ -515,6 +678,7 @@ def set_hwnd_center(hwnd=None):
 
     # 设置窗口位置（保持原来的大小，不改变层级，显示窗口）
     win32gui.SetWindowPos(hwnd, 0, x, y, 0, 0, win32con.SWP_NOSIZE | win32con.SWP_NOZORDER | win32con.SWP_SHOWWINDOW)
+    invalidate_rect_cache(hwnd)
 
 
 def is_foreground_window(hwnd):
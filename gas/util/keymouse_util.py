@@ -1,239 +1,603 @@
+import atexit
+import ctypes
+import queue
 import random
+import threading
 import time
+from ctypes import wintypes
 
 import win32api
 import win32con
 import win32gui
 
 from gas.logger import get_logger
+from gas.util.time_util import begin_high_resolution, end_high_resolution, precise_sleep
 
 logger = get_logger()
 
+# 键鼠操作间的等待多在几十毫秒以内，默认 15.6ms 的计时精度误差过大；进程内保持 1ms 精度，退出时恢复
+begin_high_resolution(1)
+atexit.register(end_high_resolution, 1)
+
+_user32 = ctypes.WinDLL("user32", use_last_error=True)
+_user32.SendMessageTimeoutW.argtypes = [
+    wintypes.HWND,
+    wintypes.UINT,
+    wintypes.WPARAM,
+    wintypes.LPARAM,
+    wintypes.UINT,
+    wintypes.UINT,
+    ctypes.POINTER(ctypes.c_size_t),
+]
+_user32.SendMessageTimeoutW.restype = ctypes.c_ssize_t
+SMTO_BLOCK = 0x0001
+SMTO_ABORTIFHUNG = 0x0002
+
+# SendInput 结构体：向当前前台窗口注入系统级输入，一次调用可提交多条事件
+INPUT_MOUSE = 0
+INPUT_KEYBOARD = 1
+KEYEVENTF_EXTENDEDKEY = 0x0001
+KEYEVENTF_KEYUP = 0x0002
+KEYEVENTF_UNICODE = 0x0004
+MOUSEEVENTF_MOVE = 0x0001
+MOUSEEVENTF_LEFTDOWN = 0x0002
+MOUSEEVENTF_LEFTUP = 0x0004
+MOUSEEVENTF_RIGHTDOWN = 0x0008
+MOUSEEVENTF_RIGHTUP = 0x0010
+MOUSEEVENTF_MIDDLEDOWN = 0x0020
+MOUSEEVENTF_MIDDLEUP = 0x0040
+MOUSEEVENTF_ABSOLUTE = 0x8000
+
+
+class MOUSEINPUT(ctypes.Structure):
+    _fields_ = [
+        ("dx", wintypes.LONG),
+        ("dy", wintypes.LONG),
+        ("mouseData", wintypes.DWORD),
+        ("dwFlags", wintypes.DWORD),
+        ("time", wintypes.DWORD),
+        ("dwExtraInfo", ctypes.c_size_t),
+    ]
+
+
+class KEYBDINPUT(ctypes.Structure):
+    _fields_ = [
+        ("wVk", wintypes.WORD),
+        ("wScan", wintypes.WORD),
+        ("dwFlags", wintypes.DWORD),
+        ("time", wintypes.DWORD),
+        ("dwExtraInfo", ctypes.c_size_t),
+    ]
+
+
+class HARDWAREINPUT(ctypes.Structure):
+    _fields_ = [("uMsg", wintypes.DWORD), ("wParamL", wintypes.WORD), ("wParamH", wintypes.WORD)]
+
+
+class _INPUTUNION(ctypes.Union):
+    _fields_ = [("mi", MOUSEINPUT), ("ki", KEYBDINPUT), ("hi", HARDWAREINPUT)]
+
+
+class INPUT(ctypes.Structure):
+    _anonymous_ = ("u",)
+    _fields_ = [("type", wintypes.DWORD), ("u", _INPUTUNION)]
+
+
+_user32.SendInput.argtypes = [wintypes.UINT, ctypes.POINTER(INPUT), ctypes.c_int]
+_user32.SendInput.restype = wintypes.UINT
+_INPUT_SIZE = ctypes.sizeof(INPUT)
+
+
+def _send_inputs(inputs) -> bool:
+    """一次 SendInput 提交整个 INPUT 数组，返回是否全部注入成功"""
+    n = len(inputs)
+    sent = _user32.SendInput(n, inputs, _INPUT_SIZE)
+    if sent != n:
+        logger.error("SendInput 只注入了 %d/%d 条事件: %s", sent, n, ctypes.WinError(ctypes.get_last_error()))
+        return False
+    return True
+
+
+_user32.MapVirtualKeyW.argtypes = [wintypes.UINT, wintypes.UINT]
+_user32.MapVirtualKeyW.restype = wintypes.UINT
+MAPVK_VK_TO_VSC = 0
+
+# 扫描码带 E0 前缀的扩展键：不设置 KEYEVENTF_EXTENDEDKEY 时，按扫描码读取的游戏会把方向键等识别成小键盘键
+_EXTENDED_VKS = frozenset(
+    (
+        win32con.VK_LEFT,
+        win32con.VK_UP,
+        win32con.VK_RIGHT,
+        win32con.VK_DOWN,
+        win32con.VK_INSERT,
+        win32con.VK_DELETE,
+        win32con.VK_HOME,
+        win32con.VK_END,
+        win32con.VK_PRIOR,
+        win32con.VK_NEXT,
+        win32con.VK_RCONTROL,
+        win32con.VK_RMENU,
+        win32con.VK_LWIN,
+        win32con.VK_RWIN,
+        win32con.VK_APPS,
+        win32con.VK_DIVIDE,
+        win32con.VK_NUMLOCK,
+        win32con.VK_SNAPSHOT,
+    )
+)
+
+# vk -> (按下, 抬起, 按下+抬起) 预先填好的 INPUT 数组，热键每次只需直接提交
+_INPUT_CACHE: dict[int, tuple[ctypes.Array, ctypes.Array, ctypes.Array]] = {}
+
+
+def _vk_code(key: str | int) -> int:
+    """字符键转换为虚拟键码，如 "a" -> 0x41"""
+    if isinstance(key, str):
+        return win32api.VkKeyScan(key) & 0xFF
+    return key
+
+
+def _key_inputs(vk: int) -> tuple[ctypes.Array, ctypes.Array, ctypes.Array]:
+    cached = _INPUT_CACHE.get(vk)
+    if cached is None:
+        # 同时填写虚拟键码和扫描码：读取扫描码的游戏（DirectInput / Raw Input）也能识别；
+        # 不使用 KEYEVENTF_SCANCODE；扩展键另加 KEYEVENTF_EXTENDEDKEY，扫描码才带 E0 前缀
+        scan = _user32.MapVirtualKeyW(vk, MAPVK_VK_TO_VSC)
+        extended = KEYEVENTF_EXTENDEDKEY if vk in _EXTENDED_VKS else 0
+        tap = (INPUT * 2)()
+        for inp, flags in ((tap[0], extended), (tap[1], extended | KEYEVENTF_KEYUP)):
+            inp.type = INPUT_KEYBOARD
+            inp.ki.wVk = vk
+            inp.ki.wScan = scan
+            inp.ki.dwFlags = flags
+        down, up = (INPUT * 1)(tap[0]), (INPUT * 1)(tap[1])
+        cached = _INPUT_CACHE[vk] = (down, up, tap)
+    return cached
+
+
+# 预热常用按键，tap_esc / tap_space / tap_enter 直接命中缓存
+for _vk in (win32con.VK_ESCAPE, win32con.VK_SPACE, win32con.VK_RETURN):
+    _key_inputs(_vk)
+
+
+def _mouse_event_batch(down_flag: int, up_flag: int, x: int | float, y: int | float, seconds: float = 0.0) -> bool:
+    """
+    在屏幕坐标 (x, y) 处点击：移动 + 按下 + 抬起构造成一个 INPUT 数组，无需等待时一次 SendInput 提交
+    坐标需换算为主屏 0~65535 的归一化绝对坐标
+    """
+    screen_w = win32api.GetSystemMetrics(win32con.SM_CXSCREEN)
+    screen_h = win32api.GetSystemMetrics(win32con.SM_CYSCREEN)
+    dx = int(x) * 65535 // max(screen_w - 1, 1)
+    dy = int(y) * 65535 // max(screen_h - 1, 1)
+
+    inputs = (INPUT * 2)()
+    for inp, flags in ((inputs[0], MOUSEEVENTF_MOVE | down_flag), (inputs[1], up_flag)):
+        inp.type = INPUT_MOUSE
+        inp.mi.dx = dx
+        inp.mi.dy = dy
+        inp.mi.dwFlags = MOUSEEVENTF_ABSOLUTE | flags
+    if seconds == 0.0:
+        return _send_inputs(inputs)
+    ok = _send_inputs((INPUT * 1)(inputs[0]))
+    _sleep(seconds)
+    return _send_inputs((INPUT * 1)(inputs[1])) and ok
+
+
+def _send_unicode_batch(text: str) -> bool:
+    """把整段文本转换为 KEYEVENTF_UNICODE 的按下/抬起事件，一次 SendInput 发送到前台窗口"""
+    # 按 UTF-16 码元发送，BMP 以外的字符（如 emoji）会拆成代理对
+    units = memoryview(text.encode("utf-16-le")).cast("H")
+    inputs = (INPUT * (len(units) * 2))()
+    for i, unit in enumerate(units):
+        down, up = inputs[2 * i], inputs[2 * i + 1]
+        down.type = up.type = INPUT_KEYBOARD
+        down.ki.wScan = up.ki.wScan = unit
+        down.ki.dwFlags = KEYEVENTF_UNICODE
+        up.ki.dwFlags = KEYEVENTF_UNICODE | KEYEVENTF_KEYUP
+    return _send_inputs(inputs)
+
+# 高频调用的 win32 函数和常量绑定到模块级名称，省去每次调用时 win32gui.xxx / win32con.xxx 的属性查找
+_post = win32gui.PostMessage
+_makelong = win32api.MAKELONG
+_sleep_fn = precise_sleep
+_random = random.random
+
+_WM_KEYDOWN = win32con.WM_KEYDOWN
+_WM_KEYUP = win32con.WM_KEYUP
+_WM_CHAR = win32con.WM_CHAR
+_WM_MOUSEMOVE = win32con.WM_MOUSEMOVE
+_WM_MOUSEWHEEL = win32con.WM_MOUSEWHEEL
+_WM_LBUTTONDOWN = win32con.WM_LBUTTONDOWN
+_WM_LBUTTONUP = win32con.WM_LBUTTONUP
+_WM_RBUTTONDOWN = win32con.WM_RBUTTONDOWN
+_WM_RBUTTONUP = win32con.WM_RBUTTONUP
+_WM_MBUTTONDOWN = win32con.WM_MBUTTONDOWN
+_WM_MBUTTONUP = win32con.WM_MBUTTONUP
+_MK_LBUTTON = win32con.MK_LBUTTON
+_MK_RBUTTON = win32con.MK_RBUTTON
+_MK_MBUTTON = win32con.MK_MBUTTON
+_WHEEL_DELTA = win32con.WHEEL_DELTA
+
+
+class _InputPump(threading.Thread):
+    """
+    输入消息泵：调用方只把 (hwnd, msg, wParam, lParam) 放入队列后立即返回，由后台线程统一投递
+    每次取到消息后，顺带取走 BATCH_WINDOW 内已经排队的消息（最多 MAX_BATCH 条）一次性连续投递
+    """
+
+    BATCH_WINDOW = 0.001  # 秒
+    MAX_BATCH = 64
+
+    def __init__(self):
+        super().__init__(name="input-pump", daemon=True)
+        self.queue = queue.SimpleQueue()
+
+    def post(self, hwnd, msg, w_param, l_param):
+        self.queue.put((hwnd, msg, w_param, l_param))
+
+    def run(self):
+        q = self.queue
+        post = win32gui.PostMessage
+        perf_counter = time.perf_counter
+        while True:
+            batch = [q.get()]
+            deadline = perf_counter() + self.BATCH_WINDOW
+            while len(batch) < self.MAX_BATCH and perf_counter() < deadline:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            for item in batch:
+                try:
+                    post(*item)
+                except Exception as e:
+                    logger.error("输入消息投递失败 %s: %s", item, e)
+
+
+_input_pump: _InputPump | None = None
+_input_pump_lock = threading.Lock()
+
+
+def enable_input_pump(enabled: bool = True):
+    """
+    开启后所有键鼠消息改由后台输入泵线程投递（默认关闭，直接在调用线程 PostMessage）
+    适合高频连点、连按的脚本；投递失败只记录日志，调用方拿不到异常
+    """
+    global _post, _input_pump
+    with _input_pump_lock:
+        if not enabled:
+            _post = win32gui.PostMessage
+            return
+        if _input_pump is None:
+            _input_pump = _InputPump()
+            _input_pump.start()
+        _post = _input_pump.post
 
-###### Keyboard ######
-class KeyMouseUtil:
 
-    @classmethod
-    def tap_key(self, hwnd, key: str | int, seconds: float = 0.0):
-        win32gui.PostMessage(hwnd, win32con.WM_KEYDOWN, key, 0)
-        self.__sleep(seconds)
-        win32gui.PostMessage(hwnd, win32con.WM_KEYUP, key, 0)
-
-    @classmethod
-    def key_down(self, hwnd, key: int | str, seconds: float = 0.0):
-        win32gui.PostMessage(hwnd, win32con.WM_KEYDOWN, key, 0)
-        self.__sleep(seconds)
-
-    @classmethod
-    def key_up(self, hwnd, key: int | str, seconds: float = 0.0):
-        win32gui.PostMessage(hwnd, win32con.WM_KEYUP, key, 0)
-        self.__sleep(seconds)
-
-    ###### Mouse ######
-
-    @classmethod
-    def click(self, hwnd, x: int | float = 0, y: int | float = 0, seconds: float = 0.0):
-        x = int(x)
-        y = int(y)
-        l_param = win32api.MAKELONG(x, y)
-        win32gui.PostMessage(hwnd, win32con.WM_LBUTTONDOWN, win32con.MK_LBUTTON, l_param)
-        self.__sleep(seconds)
-        win32gui.PostMessage(hwnd, win32con.WM_LBUTTONUP, 0, l_param)
-
-    @classmethod
-    def mouse_left_down(self, hwnd, x: int | float = 0, y: int | float = 0, seconds: float = 0.0):
-        x = int(x)
-        y = int(y)
-        l_param = win32api.MAKELONG(x, y)
-        win32gui.PostMessage(hwnd, win32con.WM_LBUTTONDOWN, win32con.MK_LBUTTON, l_param)
-        self.__sleep(seconds)
-
-    @classmethod
-    def mouse_left_up(self, hwnd, x: int, y: int, seconds: float = 0.0):
-        x = int(x)
-        y = int(y)
-        l_param = win32api.MAKELONG(x, y)
-        win32gui.PostMessage(hwnd, win32con.WM_LBUTTONUP, 0, l_param)
-        self.__sleep(seconds)
-
-    @classmethod
-    def right_click(self, hwnd, x: int | float = 0, y: int | float = 0, seconds: float = 0.0):
-        x = int(x)
-        y = int(y)
-        l_param = win32api.MAKELONG(x, y)
-        win32gui.PostMessage(hwnd, win32con.WM_RBUTTONDOWN, win32con.MK_RBUTTON, l_param)
-        self.__sleep(seconds)
-        win32gui.PostMessage(hwnd, win32con.WM_RBUTTONUP, 0, l_param)
-
-    @classmethod
-    def mouse_right_down(self, hwnd, x: int | float = 0, y: int | float = 0, seconds: float = 0.0):
-        x = int(x)
-        y = int(y)
-        l_param = win32api.MAKELONG(x, y)
-        win32gui.PostMessage(hwnd, win32con.WM_RBUTTONDOWN, win32con.MK_RBUTTON, l_param)
-        self.__sleep(seconds)
-
-    @classmethod
-    def mouse_right_up(self, hwnd, x: int | float = 0, y: int | float = 0, seconds: float = 0.0):
-        x = int(x)
-        y = int(y)
-        l_param = win32api.MAKELONG(x, y)
-        win32gui.PostMessage(hwnd, win32con.WM_RBUTTONUP, 0, l_param)
-        self.__sleep(seconds)
-
-    @classmethod
-    def middle_click(self, hwnd, x: int | float = 0, y: int | float = 0, seconds: float = 0.0):
-        x = int(x)
-        y = int(y)
-        l_param = win32api.MAKELONG(x, y)
-        win32gui.PostMessage(hwnd, win32con.WM_MBUTTONDOWN, win32con.MK_MBUTTON, l_param)
-        self.__sleep(seconds)
-        win32gui.PostMessage(hwnd, win32con.WM_MBUTTONUP, win32con.MK_MBUTTON, l_param)
-
-    @classmethod
-    def mouse_middle_down(self, hwnd, x: int | float = 0, y: int | float = 0, seconds: float = 0.0):
-        x = int(x)
-        y = int(y)
-        l_param = win32api.MAKELONG(x, y)
-        win32gui.PostMessage(hwnd, win32con.WM_MBUTTONDOWN, win32con.MK_RBUTTON, l_param)
-        self.__sleep(seconds)
-
-    @classmethod
-    def mouse_middle_up(self, hwnd, x: int | float = 0, y: int | float = 0, seconds: float = 0.0):
-        x = int(x)
-        y = int(y)
-        l_param = win32api.MAKELONG(x, y)
-        win32gui.PostMessage(hwnd, win32con.WM_MBUTTONUP, 0, l_param)
-        self.__sleep(seconds)
-
-    @classmethod
-    def mouse_move(self, hwnd, x: int | float, y: int | float, seconds: float = 0.0):
-        lParam = win32api.MAKELONG(x, y)
-        win32gui.SendMessage(hwnd, win32con.WM_MOUSEMOVE, 0, lParam)
-        self.__sleep(seconds)
-
-    @classmethod
-    def mouse_action(
-        cls, hwnd, x: int | float, y: int | float, action_type: str = "move", seconds: float = 0.0
-    ) -> bool:
-        """
-        统一的鼠标动作方法
-
-        Args:
-            hwnd: 窗口句柄
-            x: x坐标
-            y: y坐标
-            action_type: 动作类型
-                - "move": 仅移动鼠标
-                - "tap": 点击
-                - "down": 按下左键
-                - "up": 松开左键
-                - "drag": 拖拽（需要保持左键按下状态移动）
-            seconds: 延迟时间
-        """
-        try:
-            x = int(x)
-            y = int(y)
-            l_param = win32api.MAKELONG(x, y)
-
-            if action_type == "move":
-                # 普通移动
-                win32gui.SendMessage(hwnd, win32con.WM_MOUSEMOVE, 0, l_param)
-
-            elif action_type == "tap":
-                # 点击
-                win32gui.PostMessage(hwnd, win32con.WM_LBUTTONDOWN, win32con.MK_LBUTTON, l_param)
-                cls.__sleep(0.05)
-                win32gui.PostMessage(hwnd, win32con.WM_LBUTTONUP, 0, l_param)
-
-            elif action_type == "down":
-                # 按下左键
-                win32gui.PostMessage(hwnd, win32con.WM_LBUTTONDOWN, win32con.MK_LBUTTON, l_param)
-
-            elif action_type == "up":
-                # 松开左键
-                win32gui.PostMessage(hwnd, win32con.WM_LBUTTONUP, 0, l_param)
-
-            elif action_type == "drag":
-                # 拖拽（移动时保持左键按下）
-                win32gui.SendMessage(hwnd, win32con.WM_MOUSEMOVE, win32con.MK_LBUTTON, l_param)
-
-            cls.__sleep(seconds)
-            return True
-
-        except Exception as e:
-            print(f"鼠标动作失败 ({action_type}): {e}")
-            return False
-
-    @classmethod
-    def scroll_mouse(self, hwnd, count: int, x: int | float = 0, y: int | float = 0, seconds: float = 0.0):
-        """
-        鼠标滚轮滚动
-
-        :param seconds:
-        :param hwnd: 目标窗口句柄
-        :param count: 一次滚动多少个单位（正数=向上滚，负数=向下滚）
-        :param x: 鼠标 X 坐标
-        :param y: 鼠标 Y 坐标
-        """
-        w_param = win32api.MAKELONG(0, win32con.WHEEL_DELTA * count)
-        l_param = win32api.MAKELONG(x, y)  # 鼠标位置，相对于窗口
-        win32gui.PostMessage(hwnd, win32con.WM_MOUSEWHEEL, w_param, l_param)
-        self.__sleep(seconds)
-
-    ###### Other ######
-
-    @classmethod
-    def window_activate(self, hwnd, seconds: float = 0.0):
-        win32gui.PostMessage(hwnd, win32con.WM_ACTIVATE, win32con.WA_ACTIVE, 0)
-        self.__sleep(seconds)
-
-    @classmethod
-    def __sleep(self, seconds: float):
+def _make_lparam(x: int | float, y: int | float) -> int:
+    """鼠标消息的 lParam（低 16 位 x，高 16 位 y）"""
+    return ((int(y) & 0xFFFF) << 16) | (int(x) & 0xFFFF)
+
+
+def _sleep(seconds: float):
+    """seconds 为 0 不等待，大于 0 等待指定秒数，小于 0 随机等待 40~60ms"""
+    if seconds == 0.0:
+        return
+    if seconds > 0.0:
+        _sleep_fn(seconds)
+    else:  # < 0.0
+        _sleep_fn(0.04 + 0.02 * _random())
+
+
+###### Keyboard ######
+# hwnd 为 None 时通过 SendInput 输入到前台窗口（使用缓存的 INPUT 结构体），否则向 hwnd 投递消息
+def tap_key(hwnd, key: str | int, seconds: float = 0.0):
+    if hwnd is None:
+        down, up, tap = _key_inputs(_vk_code(key))
         if seconds == 0.0:
+            _send_inputs(tap)
             return
-        if seconds > 0.0:
-            time.sleep(seconds)
-        else:  # < 0.0
-            seconds = round(random.uniform(0.04, 0.06), 4)
-            time.sleep(seconds)
-
-    @classmethod
-    def tap_esc(self, hwnd):
-        self.tap_key(hwnd, win32con.VK_ESCAPE)
-
-    @classmethod
-    def tap_space(self, hwnd):
-        self.tap_key(hwnd, win32con.VK_SPACE)
-
-    @classmethod
-    def tap_enter(self, hwnd):
-        self.tap_key(hwnd, win32con.VK_RETURN)
-
-    @classmethod
-    def get_key_state(self, vk_code):
-        return win32api.GetAsyncKeyState(vk_code) < 0
-
-    @classmethod
-    def get_mouse_position(self):
-        x, y = win32api.GetCursorPos()
-        return x, y
-
-    @classmethod
-    def set_mouse_position(self, hwnd, x: int, y: int):
-        win32api.SetCursorPos((x, y))
-
-    @classmethod
-    def input_char(self, hwnd, char, seconds: float = 0.0):
-        """发送文本，一次一个字符"""
-        win32gui.PostMessage(hwnd, win32con.WM_CHAR, ord(char), 0)
-        self.__sleep(seconds)
-
-    @classmethod
-    def input_text(self, hwnd, text: str, seconds: float = 0.0):
-        """发送文本，字符串"""
-        if len(text) == 0:
-            return
+        _send_inputs(down)
+        _sleep(seconds)
+        _send_inputs(up)
+        return
+    _post(hwnd, _WM_KEYDOWN, key, 0)
+    _sleep(seconds)
+    _post(hwnd, _WM_KEYUP, key, 0)
+
+
+def key_down(hwnd, key: int | str, seconds: float = 0.0):
+    if hwnd is None:
+        _send_inputs(_key_inputs(_vk_code(key))[0])
+    else:
+        _post(hwnd, _WM_KEYDOWN, key, 0)
+    _sleep(seconds)
+
+
+def key_up(hwnd, key: int | str, seconds: float = 0.0):
+    if hwnd is None:
+        _send_inputs(_key_inputs(_vk_code(key))[1])
+    else:
+        _post(hwnd, _WM_KEYUP, key, 0)
+    _sleep(seconds)
+
+
+###### Mouse ######
+# click / right_click / middle_click 的 hwnd 为 None 时，(x, y) 为屏幕坐标，通过 SendInput 在前台点击
+def click(hwnd, x: int | float = 0, y: int | float = 0, seconds: float = 0.0):
+    if hwnd is None:
+        _mouse_event_batch(MOUSEEVENTF_LEFTDOWN, MOUSEEVENTF_LEFTUP, x, y, seconds)
+        return
+    l_param = _make_lparam(x, y)
+    _post(hwnd, _WM_LBUTTONDOWN, _MK_LBUTTON, l_param)
+    _sleep(seconds)
+    _post(hwnd, _WM_LBUTTONUP, 0, l_param)
+
+
+def mouse_left_down(hwnd, x: int | float = 0, y: int | float = 0, seconds: float = 0.0):
+    _post(hwnd, _WM_LBUTTONDOWN, _MK_LBUTTON, _make_lparam(x, y))
+    _sleep(seconds)
+
+
+def mouse_left_up(hwnd, x: int, y: int, seconds: float = 0.0):
+    _post(hwnd, _WM_LBUTTONUP, 0, _make_lparam(x, y))
+    _sleep(seconds)
+
+
+def right_click(hwnd, x: int | float = 0, y: int | float = 0, seconds: float = 0.0):
+    if hwnd is None:
+        _mouse_event_batch(MOUSEEVENTF_RIGHTDOWN, MOUSEEVENTF_RIGHTUP, x, y, seconds)
+        return
+    l_param = _make_lparam(x, y)
+    _post(hwnd, _WM_RBUTTONDOWN, _MK_RBUTTON, l_param)
+    _sleep(seconds)
+    _post(hwnd, _WM_RBUTTONUP, 0, l_param)
+
+
+def mouse_right_down(hwnd, x: int | float = 0, y: int | float = 0, seconds: float = 0.0):
+    _post(hwnd, _WM_RBUTTONDOWN, _MK_RBUTTON, _make_lparam(x, y))
+    _sleep(seconds)
+
+
+def mouse_right_up(hwnd, x: int | float = 0, y: int | float = 0, seconds: float = 0.0):
+    _post(hwnd, _WM_RBUTTONUP, 0, _make_lparam(x, y))
+    _sleep(seconds)
+
+
+def middle_click(hwnd, x: int | float = 0, y: int | float = 0, seconds: float = 0.0):
+    if hwnd is None:
+        _mouse_event_batch(MOUSEEVENTF_MIDDLEDOWN, MOUSEEVENTF_MIDDLEUP, x, y, seconds)
+        return
+    l_param = _make_lparam(x, y)
+    _post(hwnd, _WM_MBUTTONDOWN, _MK_MBUTTON, l_param)
+    _sleep(seconds)
+    _post(hwnd, _WM_MBUTTONUP, _MK_MBUTTON, l_param)
+
+
+def mouse_middle_down(hwnd, x: int | float = 0, y: int | float = 0, seconds: float = 0.0):
+    _post(hwnd, _WM_MBUTTONDOWN, _MK_RBUTTON, _make_lparam(x, y))
+    _sleep(seconds)
+
+
+def mouse_middle_up(hwnd, x: int | float = 0, y: int | float = 0, seconds: float = 0.0):
+    _post(hwnd, _WM_MBUTTONUP, 0, _make_lparam(x, y))
+    _sleep(seconds)
+
+
+def mouse_move(hwnd, x: int | float, y: int | float, seconds: float = 0.0):
+    # PostMessage 不等待目标窗口处理，窗口卡顿时不会阻塞调用线程；
+    # 需要确认窗口已处理完移动（如依赖悬停反馈）时改用 send_message_timeout
+    _post(hwnd, _WM_MOUSEMOVE, 0, _make_lparam(x, y))
+    _sleep(seconds)
+
+
+def mouse_move_sync(hwnd, x: int | float, y: int | float, seconds: float = 0.0, timeout_ms: int = 50) -> bool:
+    """
+    同步版 mouse_move：等待目标窗口处理完 WM_MOUSEMOVE 再返回（最多 timeout_ms 毫秒），
+    用于下一步操作依赖窗口已响应移动（如悬停高亮）的场景；返回是否在超时前处理完成
+    """
+    done = send_message_timeout(hwnd, _WM_MOUSEMOVE, 0, _make_lparam(x, y), timeout_ms) is not None
+    _sleep(seconds)
+    return done
+
+
+def mouse_action(hwnd, x: int | float, y: int | float, action_type: str = "move", seconds: float = 0.0) -> bool:
+    """
+    统一的鼠标动作方法
+
+    Args:
+        hwnd: 窗口句柄
+        x: x坐标
+        y: y坐标
+        action_type: 动作类型
+            - "move": 仅移动鼠标
+            - "tap": 点击
+            - "down": 按下左键
+            - "up": 松开左键
+            - "drag": 拖拽（需要保持左键按下状态移动）
+        seconds: 延迟时间
+    """
+    try:
+        l_param = _make_lparam(x, y)
+
+        if action_type == "move":
+            # 普通移动（投递后立即返回，与后续按键消息按队列顺序处理）
+            _post(hwnd, _WM_MOUSEMOVE, 0, l_param)
+
+        elif action_type == "tap":
+            # 点击
+            _post(hwnd, _WM_LBUTTONDOWN, _MK_LBUTTON, l_param)
+            _sleep(0.05)
+            _post(hwnd, _WM_LBUTTONUP, 0, l_param)
+
+        elif action_type == "down":
+            # 按下左键
+            _post(hwnd, _WM_LBUTTONDOWN, _MK_LBUTTON, l_param)
+
+        elif action_type == "up":
+            # 松开左键
+            _post(hwnd, _WM_LBUTTONUP, 0, l_param)
+
+        elif action_type == "drag":
+            # 拖拽（移动时保持左键按下）
+            _post(hwnd, _WM_MOUSEMOVE, _MK_LBUTTON, l_param)
+
+        _sleep(seconds)
+        return True
+
+    except Exception as e:
+        print(f"鼠标动作失败 ({action_type}): {e}")
+        return False
+
+
+def scroll_mouse(hwnd, count: int, x: int | float = 0, y: int | float = 0, seconds: float = 0.0):
+    """
+    鼠标滚轮滚动
+
+    :param seconds:
+    :param hwnd: 目标窗口句柄
+    :param count: 一次滚动多少个单位（正数=向上滚，负数=向下滚）
+    :param x: 鼠标 X 坐标
+    :param y: 鼠标 Y 坐标
+    """
+    w_param = _makelong(0, _WHEEL_DELTA * count)
+    l_param = _make_lparam(x, y)  # 鼠标位置，相对于窗口
+    _post(hwnd, _WM_MOUSEWHEEL, w_param, l_param)
+    _sleep(seconds)
+
+
+def smooth_scroll(
+    hwnd, total: int, x: int | float = 0, y: int | float = 0, steps: int = 10, interval_ms: float = 8
+):
+    """
+    平滑滚动：把 total 个滚轮单位尽量均匀地拆成 steps 次 WM_MOUSEWHEEL，每次间隔 interval_ms 毫秒
+
+    所有消息参数预先计算好，循环中只做投递和精确等待，调用方无需在 Python 循环里逐次调用 scroll_mouse
+    """
+    if total == 0 or steps <= 0:
+        return
+    sign = 1 if total > 0 else -1
+    per, remainder = divmod(abs(total), steps)
+    # 前 remainder 次多滚一个单位；为 0 的步直接跳过
+    w_params = [
+        _makelong(0, _WHEEL_DELTA * sign * (per + (1 if i < remainder else 0)))
+        for i in range(steps)
+        if per or i < remainder
+    ]
+    l_param = _make_lparam(x, y)
+    interval = interval_ms / 1000
+    last = len(w_params) - 1
+    for i, w_param in enumerate(w_params):
+        _post(hwnd, _WM_MOUSEWHEEL, w_param, l_param)
+        if i < last:
+            _sleep_fn(interval)
+
+
+###### Other ######
+def send_message_timeout(hwnd, msg: int, w_param: int = 0, l_param: int = 0, timeout_ms: int = 50):
+    """
+    同步发送消息，但最多等待 timeout_ms 毫秒，目标窗口无响应时立即放弃，避免 SendMessage 无限期阻塞
+
+    :return: 窗口过程的返回值；超时或失败返回 None
+    """
+    result = ctypes.c_size_t()
+    ok = _user32.SendMessageTimeoutW(
+        hwnd, msg, w_param, l_param, SMTO_ABORTIFHUNG | SMTO_BLOCK, timeout_ms, ctypes.byref(result)
+    )
+    if not ok:
+        logger.debug("SendMessageTimeout 超时或失败: hwnd=%s, msg=%#x", hwnd, msg)
+        return None
+    return result.value
+
+
+def window_activate(hwnd, seconds: float = 0.0):
+    _post(hwnd, win32con.WM_ACTIVATE, win32con.WA_ACTIVE, 0)
+    _sleep(seconds)
+
+
+def tap_esc(hwnd):
+    tap_key(hwnd, win32con.VK_ESCAPE)
+
+
+def tap_space(hwnd):
+    tap_key(hwnd, win32con.VK_SPACE)
+
+
+def tap_enter(hwnd):
+    tap_key(hwnd, win32con.VK_RETURN)
+
+
+def get_key_state(vk_code):
+    return win32api.GetAsyncKeyState(vk_code) < 0
+
+
+def get_mouse_position():
+    x, y = win32api.GetCursorPos()
+    return x, y
+
+
+def set_mouse_position(hwnd, x: int, y: int):
+    win32api.SetCursorPos((x, y))
+
+
+def input_char(hwnd, char, seconds: float = 0.0):
+    """发送文本，一次一个字符"""
+    _post(hwnd, _WM_CHAR, ord(char), 0)
+    _sleep(seconds)
+
+
+def input_text(hwnd, text: str, seconds: float = 0.0, char_interval: float = 0.0):
+    """
+    发送文本，字符串
+
+    hwnd 为 None 时输入到当前前台窗口：整段文本通过一次 SendInput（KEYEVENTF_UNICODE）提交；
+    指定 hwnd 时 WM_CHAR 通过 PostMessage 投递到目标窗口的消息队列，按顺序处理，默认连续投递、字符间不等待；
+    个别窗口处理不过来时可以用 char_interval 指定字符间隔（秒）
+    """
+    if len(text) == 0:
+        return
+    if hwnd is None and char_interval <= 0.0:
+        _send_unicode_batch(text)
+    elif char_interval > 0.0:
+        for char in text:
+            input_char(hwnd, char, char_interval)
+    else:
         for char in text:
-            self.input_char(hwnd, char, 0.03)
-        self.__sleep(seconds)
+            _post(hwnd, _WM_CHAR, ord(char), 0)
+    _sleep(seconds)
+
+
+class KeyMouseUtil:
+    """
+    键鼠操作的命名空间，保留 KeyMouseUtil.xxx 的调用方式；实际实现均为模块级函数，
+    高频循环中可以直接 from gas.util.keymouse_util import tap_key 调用，省去类属性查找
+    """
+
+    tap_key = staticmethod(tap_key)
+    key_down = staticmethod(key_down)
+    key_up = staticmethod(key_up)
+    click = staticmethod(click)
+    mouse_left_down = staticmethod(mouse_left_down)
+    mouse_left_up = staticmethod(mouse_left_up)
+    right_click = staticmethod(right_click)
+    mouse_right_down = staticmethod(mouse_right_down)
+    mouse_right_up = staticmethod(mouse_right_up)
+    middle_click = staticmethod(middle_click)
+    mouse_middle_down = staticmethod(mouse_middle_down)
+    mouse_middle_up = staticmethod(mouse_middle_up)
+    mouse_move = staticmethod(mouse_move)
+    mouse_move_sync = staticmethod(mouse_move_sync)
+    mouse_action = staticmethod(mouse_action)
+    scroll_mouse = staticmethod(scroll_mouse)
+    smooth_scroll = staticmethod(smooth_scroll)
+    send_message_timeout = staticmethod(send_message_timeout)
+    window_activate = staticmethod(window_activate)
+    tap_esc = staticmethod(tap_esc)
+    tap_space = staticmethod(tap_space)
+    tap_enter = staticmethod(tap_enter)
+    get_key_state = staticmethod(get_key_state)
+    get_mouse_position = staticmethod(get_mouse_position)
+    set_mouse_position = staticmethod(set_mouse_position)
+    input_char = staticmethod(input_char)
+    input_text = staticmethod(input_text)
+    enable_input_pump = staticmethod(enable_input_pump)
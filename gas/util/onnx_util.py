@@ -1,17 +1,89 @@
 # onnx_util.py
 import ast
 import json
+import os
+import threading
 import onnxruntime as ort
 import onnx
 import cv2
 import numpy as np
 import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from typing import Union, List, Dict, Tuple, Optional
 from gas.logger import get_logger
 
 log = get_logger()
 
+# torchvision 为可选依赖，首次做 NMS 时才尝试导入（torch 导入较慢）；未安装时使用 OpenCV
+_torch_nms = None
+_torch_nms_checked = False
+
+
+def _get_torch_nms():
+    global _torch_nms, _torch_nms_checked
+    if not _torch_nms_checked:
+        _torch_nms_checked = True
+        try:
+            import torch
+            from torchvision.ops import nms
+
+            def _torch_nms(boxes, scores, iou):
+                return nms(torch.from_numpy(boxes), torch.from_numpy(scores), iou).numpy()
+
+        except ImportError:
+            log.debug("torchvision 未安装，NMS 使用 cv2.dnn.NMSBoxes")
+        except Exception as e:
+            # torch/torchvision 版本不匹配、DLL 加载失败等也会在导入时抛出非 ImportError 异常
+            log.warning(f"torchvision 导入失败，NMS 使用 cv2.dnn.NMSBoxes: {e}")
+    return _torch_nms
+
+
+def nms_xyxy(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float, score_threshold: float) -> np.ndarray:
+    """
+    与类别无关的 NMS，直接在 ndarray 上计算，返回按置信度降序保留的下标
+    - boxes: (N, 4) x1, y1, x2, y2
+    - scores: (N,)
+    """
+    global _torch_nms
+    boxes = np.ascontiguousarray(boxes, dtype=np.float32)
+    scores = np.ascontiguousarray(scores, dtype=np.float32)
+
+    torch_nms = _get_torch_nms()
+    if torch_nms is not None:
+        try:
+            keep = torch_nms(boxes, scores, iou_threshold)
+            return keep[scores[keep] > score_threshold]
+        except Exception as e:
+            # 导入成功但算子不可用（如缺少 nms 内核）时，只记录一次并永久改用 OpenCV
+            log.warning(f"torchvision NMS 调用失败，改用 cv2.dnn.NMSBoxes: {e}")
+            _torch_nms = None
+
+    # cv2.dnn.NMSBoxes 需要 [x, y, w, h] 格式，可直接接收 ndarray，无需 tolist
+    xywh = boxes.copy()
+    xywh[:, 2:] -= xywh[:, :2]
+    indices = cv2.dnn.NMSBoxes(bboxes=xywh, scores=scores, score_threshold=score_threshold, nms_threshold=iou_threshold)
+    # 不同 OpenCV 版本可能返回 (N,)、(N, 1) 的 ndarray 或空 tuple，统一展平
+    return np.asarray(indices, dtype=np.int64).reshape(-1)
+
+
+def _write_image(path: str, img: np.ndarray):
+    """imencode + tofile 写入图片，支持中文路径；在后台保存线程中执行，异常只记录日志"""
+    try:
+        ok, buf = cv2.imencode(Path(path).suffix or ".png", img)
+        if not ok:
+            log.error(f"图片编码失败: {path}")
+            return
+        buf.tofile(path)
+        log.debug(f"Result saved to {path}")
+    except Exception as e:
+        log.error(f"保存结果图片失败 {path}: {e}")
+
+
+# 默认按此优先级选择当前 onnxruntime 实际可用的执行提供者
+DEFAULT_PROVIDERS = ["CUDAExecutionProvider", "DmlExecutionProvider", "CPUExecutionProvider"]
+
 
 class YOLOONNXDetector:
     """
@@ -26,27 +98,53 @@ class YOLOONNXDetector:
         iou_threshold: float = 0.45,
         input_size: Tuple[int, int] = (640, 640),
         providers: Optional[List[str]] = None,
+        num_threads: Optional[int] = None,
+        prefer_quantized: bool = True,
     ):
         self.conf_threshold = conf_threshold
         self.iou_threshold = iou_threshold
         self.input_width, self.input_height = input_size
+        # 结果图片在后台线程编码写盘，不阻塞下一帧检测
+        self._save_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="onnx-save")
+        # IOBinding 和输出缓冲区只有一份，推理 + 后处理需要串行
+        self._infer_lock = threading.Lock()
+        # submit / result 流水线：推理线程和尚未取走的结果
+        self._infer_pool: Optional[ThreadPoolExecutor] = None
+        self._pending: deque[Future] = deque()
+        self.pipeline_depth = 2
+        # letterbox 参数缓存：(原图 h, w), (目标 h, w) -> 缩放比例、缩放尺寸、填充
+        self._lb_cache: Dict[tuple, tuple] = {}
 
         self.model_path = Path(model_path)
         if not self.model_path.exists():
             raise FileNotFoundError(f"ONNX model not found: {model_path}")
 
-        # 执行提供者CPU
+        # 存在 quantize_model 生成的 INT8 模型（xxx.quant.onnx）时优先加载，CPU 上可走 VNNI 整数指令
+        session_path = self.model_path
+        quant_path = quantized_model_path(self.model_path)
+        if prefer_quantized and quant_path.exists():
+            log.debug(f"Using quantized model: {quant_path}")
+            session_path = quant_path
+
+        # 执行提供者：未指定时优先 GPU（CUDA / DirectML），只保留已安装的提供者，最后回退 CPU
         if providers is None:
-            providers = ["CPUExecutionProvider"]
+            available = set(ort.get_available_providers())
+            providers = [p for p in DEFAULT_PROVIDERS if p in available] or ["CPUExecutionProvider"]
 
-        log.debug(f"Loading ONNX model: {model_path}")
-        self.session = ort.InferenceSession(str(self.model_path), providers=providers)
+        log.debug(f"Loading ONNX model: {session_path}, providers: {providers}")
+        self.session = ort.InferenceSession(
+            str(session_path), sess_options=self._session_options(num_threads), providers=providers
+        )
 
         # 输入/输出信息
         input_info = self.session.get_inputs()[0]
         self.input_name = input_info.name
         self.input_shape = input_info.shape  # [1, 3, H, W] or dynamic
 
+        # IOBinding：输出形状固定时绑定到预分配缓冲区，推理结果直接写入，不再每帧分配和复制
+        self._io_binding = self.session.io_binding()
+        self._output_bufs = self._bind_outputs()
+
         # # 自动获取模型实际输入尺寸（支持动态轴）
         # if self.input_shape[2] not in (-1, 0) and self.input_shape[3] not in (-1, 0):
         #     self.input_height = self.input_shape[2]
@@ -62,6 +160,48 @@ class YOLOONNXDetector:
 
         log.debug(f"Loaded {len(self.class_names)} classes, {self.class_names}")
 
+    @staticmethod
+    def _session_options(num_threads: Optional[int]) -> ort.SessionOptions:
+        """开启全部图优化（算子融合、常量折叠等），单模型顺序执行，算子内并行使用全部核心"""
+        so = ort.SessionOptions()
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        so.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        so.intra_op_num_threads = num_threads if num_threads is not None else (os.cpu_count() or 0)
+        so.enable_mem_pattern = True
+        so.enable_cpu_mem_arena = True
+        return so
+
+    # onnx 输出类型 -> numpy dtype，只有这些类型才预分配输出缓冲区
+    _OUTPUT_DTYPES = {"tensor(float)": np.float32, "tensor(float16)": np.float16}
+
+    def _bind_outputs(self) -> Optional[List[np.ndarray]]:
+        """输出形状固定时预分配缓冲区并绑定，返回缓冲区列表；存在动态维度时由 ORT 分配，返回 None"""
+        outputs = self.session.get_outputs()
+        static = all(
+            o.type in self._OUTPUT_DTYPES and all(isinstance(d, int) and d > 0 for d in o.shape) for o in outputs
+        )
+        if not static:
+            for o in outputs:
+                self._io_binding.bind_output(o.name, "cpu")
+            return None
+
+        bufs = []
+        for o in outputs:
+            dtype = self._OUTPUT_DTYPES[o.type]
+            buf = np.empty(o.shape, dtype=dtype)
+            self._io_binding.bind_output(o.name, "cpu", 0, dtype, buf.shape, buf.ctypes.data)
+            bufs.append(buf)
+        return bufs
+
+    def _run(self, input_tensor: np.ndarray) -> List[np.ndarray]:
+        """通过 IOBinding 推理；返回的预分配缓冲区会在下一次推理时被覆盖"""
+        # 输入直接引用 numpy 内存，不经过 session.run 的 feed 字典转换
+        self._io_binding.bind_cpu_input(self.input_name, input_tensor)
+        self.session.run_with_iobinding(self._io_binding)
+        if self._output_bufs is not None:
+            return self._output_bufs
+        return self._io_binding.copy_outputs_to_cpu()
+
     def get_class_names(self) -> Optional[List[str]]:
         return self.class_names
 
@@ -124,18 +264,24 @@ class YOLOONNXDetector:
         if isinstance(new_shape, int):
             new_shape = (new_shape, new_shape)
 
-        r = min(new_shape[1] / shape[1], new_shape[0] / shape[0])
-        new_unpad = int(round(shape[1] * r)), int(round(shape[0] * r))
+        # 截图分辨率通常固定，缩放参数按 (原尺寸, 目标尺寸) 缓存，每帧只做 resize 和填充
+        key = (shape, tuple(new_shape))
+        params = self._lb_cache.get(key)
+        if params is None:
+            r = min(new_shape[1] / shape[1], new_shape[0] / shape[0])
+            new_unpad = int(round(shape[1] * r)), int(round(shape[0] * r))
+
+            dw, dh = new_shape[1] - new_unpad[0], new_shape[0] - new_unpad[1]
+            dw /= 2
+            dh /= 2
 
-        dw, dh = new_shape[1] - new_unpad[0], new_shape[0] - new_unpad[1]
-        dw /= 2
-        dh /= 2
+            border = (int(round(dh - 0.1)), int(round(dh + 0.1)), int(round(dw - 0.1)), int(round(dw + 0.1)))
+            params = self._lb_cache[key] = (r, new_unpad, dw, dh, shape[::-1] != new_unpad, border)
+        r, new_unpad, dw, dh, need_resize, (top, bottom, left, right) = params
 
-        if shape[::-1] != new_unpad:
+        if need_resize:
             img = cv2.resize(img, new_unpad, interpolation=cv2.INTER_LINEAR)
 
-        top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
-        left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
         img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
 
         return img, r, (dw, dh)
@@ -144,16 +290,20 @@ class YOLOONNXDetector:
         """
         标准 YOLO ONNX 预处理
         """
-        img = image.copy()
-        original_shape = img.shape[:2]  # (h, w)
+        original_shape = image.shape[:2]  # (h, w)
 
-        # letterbox
-        img_resized, ratio, (dw, dh) = self._letterbox(img, (self.input_height, self.input_width))
+        # letterbox（resize / copyMakeBorder 都会生成新数组，不会修改输入图像，无需先复制）
+        img_resized, ratio, (dw, dh) = self._letterbox(image, (self.input_height, self.input_width))
 
         # BGR -> RGB, HWC -> CHW, /255, add batch dim
-        img_input = img_resized[:, :, ::-1].transpose(2, 0, 1)  # BGR to RGB + HWC to CHW
-        img_input = np.ascontiguousarray(img_input).astype(np.float32) / 255.0
-        img_input = img_input[None]  # (1, 3, H, W)
+        # blobFromImage 在 C++ 中一次完成通道交换、归一化和排布转换，直接输出连续的 (1, 3, H, W) float32
+        img_input = cv2.dnn.blobFromImage(
+            img_resized,
+            scalefactor=1 / 255.0,
+            size=(self.input_width, self.input_height),
+            swapRB=True,
+            crop=False,
+        )
 
         meta = {
             "original_shape": original_shape,
@@ -181,76 +331,67 @@ class YOLOONNXDetector:
         boxes = pred[:, :4]  # (8400, 4)  xywh 中心坐标
         scores = pred[:, 4:]  # (8400, nc)
 
-        # 4. 取最大置信度及其类别
-        class_conf = np.max(scores, axis=1)  # (8400,)
-        class_ids = np.argmax(scores, axis=1)  # (8400,)
+        # 4. 取最大置信度
+        max_scores = scores.max(axis=1)  # (8400,)
 
         # 5. 置信度过滤（关键：这里 mask 长度 = 8400，和 boxes 的第0维匹配！）
-        mask = class_conf > self.conf_threshold
-        if not np.any(mask):
+        mask = max_scores > self.conf_threshold
+        if not mask.any():
             return []
 
         boxes = boxes[mask]
-        class_conf = class_conf[mask]
-        class_ids = class_ids[mask]
-
-        # 6. 转为角点坐标
-        x = boxes[:, 0]
-        y = boxes[:, 1]
-        w = boxes[:, 2]
-        h = boxes[:, 3]
-        x1 = x - w / 2
-        y1 = y - h / 2
-        x2 = x + w / 2
-        y2 = y + h / 2
-
-        # 7. 去除 letterbox padding 并缩放到原图
+        class_conf = max_scores[mask]
+        # 类别只需对通过过滤的少量候选求 argmax
+        class_ids = scores[mask].argmax(axis=1)
+
+        # 6~7. 中心点 xywh -> 角点 xyxy，去除 letterbox padding 并缩放到原图
+        # 全部写入同一块 (N, 4) 缓冲区，避免逐列生成中间数组；该缓冲区也直接用于 NMS
         ratio = meta["ratio"]
         dw, dh = meta["pad"]
-        x1 = (x1 - dw) / ratio
-        y1 = (y1 - dh) / ratio
-        x2 = (x2 - dw) / ratio
-        y2 = (y2 - dh) / ratio
-
-        # 8. NMS（注意 cv2.dnn.NMSBoxes 需要 [x,y,w,h] 格式）
-        nms_boxes = np.stack([x1, y1, x2 - x1, y2 - y1], axis=1).tolist()
-        indices = cv2.dnn.NMSBoxes(
-            bboxes=nms_boxes,
-            scores=class_conf.tolist(),
-            score_threshold=self.conf_threshold,
-            nms_threshold=self.iou_threshold,
-        )
+        half_wh = boxes[:, 2:4] * 0.5
+        xyxy = np.empty_like(boxes)
+        np.subtract(boxes[:, :2], half_wh, out=xyxy[:, :2])
+        np.add(boxes[:, :2], half_wh, out=xyxy[:, 2:])
+        xyxy -= np.array([dw, dh, dw, dh], dtype=xyxy.dtype)
+        xyxy /= ratio
+        x1, y1, x2, y2 = xyxy.T
+
+        # 8. NMS（直接在数组上计算，优先 torchvision，未安装时使用 OpenCV）
+        indices = nms_xyxy(xyxy, class_conf, self.iou_threshold, self.conf_threshold)
 
         if len(indices) == 0:
             return []
 
-        # OpenCV >=4.5.4 返回的是 tuple，旧版返回 ndarray
-        if isinstance(indices, tuple):
-            indices = indices[0]
-        indices = np.array(indices).flatten()
-
-        # 9. 组装最终结果
-        detections = []
+        # 9. 组装最终结果：先按列整体截断取整、裁剪到原图范围，每列只做一次 tolist，再逐条组装字典
         orig_h, orig_w = meta["original_shape"]
-
-        for i in indices:
-            conf = float(class_conf[i])
-            cls_id = int(class_ids[i])
-            box = [
-                max(0, int(x1[i])),
-                max(0, int(y1[i])),
-                min(orig_w, int(x2[i])),
-                min(orig_h, int(y2[i])),
-            ]
-            detections.append(
-                {
-                    "box": box,
-                    "confidence": conf,
-                    "class_id": cls_id,
-                    "class_name": self.class_names[cls_id] if cls_id < len(self.class_names) else f"class_{cls_id}",
-                    "center": ((box[0] + box[2]) // 2, (box[1] + box[3]) // 2),
-                }
+        bx1 = np.maximum(x1[indices].astype(np.int64), 0)
+        by1 = np.maximum(y1[indices].astype(np.int64), 0)
+        bx2 = np.minimum(x2[indices].astype(np.int64), orig_w)
+        by2 = np.minimum(y2[indices].astype(np.int64), orig_h)
+        cx = (bx1 + bx2) // 2
+        cy = (by1 + by2) // 2
+
+        class_names = self.class_names
+        num_names = len(class_names)
+        detections = [
+            {
+                "box": [a, b, c, d],
+                "confidence": conf,
+                "class_id": cls_id,
+                "class_name": class_names[cls_id] if cls_id < num_names else f"class_{cls_id}",
+                "center": (x, y),
+            }
+            for a, b, c, d, conf, cls_id, x, y in zip(
+                bx1.tolist(),
+                by1.tolist(),
+                bx2.tolist(),
+                by2.tolist(),
+                class_conf[indices].tolist(),
+                class_ids[indices].tolist(),
+                cx.tolist(),
+                cy.tolist(),
             )
+        ]
 
         return detections
 
@@ -260,35 +401,73 @@ class YOLOONNXDetector:
         source: Union[str, Path, np.ndarray],
         save_path: Optional[Union[str, Path]] = None,
         draw: bool = True,
+        inplace: bool = False,
     ) -> Tuple[np.ndarray, List[Dict], float]:
         """
         单张图像检测
+
+        :param draw: 是否在结果图上绘制检测框；为 False 时返回的结果图就是输入图像本身（不复制）
+        :param inplace: 为 True 时直接在输入图像上绘制，省去整图复制（会修改传入的数组）
         """
         if isinstance(source, (str, Path)):
-            img = cv2.imread(str(source))
+            # np.fromfile + imdecode 支持中文路径（cv2.imread 在 Windows 上不支持）
+            img = cv2.imdecode(np.fromfile(str(source), dtype=np.uint8), cv2.IMREAD_COLOR)
             if img is None:
                 raise FileNotFoundError(f"Cannot read image: {source}")
         else:
             img = source
 
         input_tensor, meta = self._preprocess(img)
+        detections, infer_ms = self._infer(input_tensor, meta)
 
-        start_time = time.time()
-        outputs = self.session.run(None, {self.input_name: input_tensor})
-        infer_ms = (time.time() - start_time) * 1000
-
-        detections = self._postprocess(outputs, meta)
-
-        result_img = img.copy()
+        # 只有需要绘制且不允许修改原图时才复制整张图像
         if draw:
-            result_img = self.draw_detections(result_img, detections)
+            result_img = self.draw_detections(img if inplace else img.copy(), detections)
+        else:
+            result_img = img
 
         if save_path:
-            cv2.imwrite(str(save_path), result_img)
-            log.debug(f"Result saved to {save_path}")
+            # 结果图同时返回给调用方，交给后台线程的是一份副本，避免写盘前被调用方修改
+            self._save_pool.submit(_write_image, str(save_path), result_img.copy())
 
         return result_img, detections, infer_ms
 
+    def _infer(self, input_tensor: np.ndarray, meta: Dict) -> Tuple[List[Dict], float]:
+        """推理 + 后处理，返回 (检测结果, 推理耗时 ms)；后处理读取的是共享输出缓冲区，需在锁内完成"""
+        with self._infer_lock:
+            start_time = time.time()
+            outputs = self._run(input_tensor)
+            infer_ms = (time.time() - start_time) * 1000
+            detections = self._postprocess(outputs, meta)
+        return detections, infer_ms
+
+    # ==================== 流水线接口 ====================
+    def submit(self, image: np.ndarray):
+        """
+        提交一帧到流水线后立即返回：预处理在调用线程完成，推理和后处理在后台线程执行，
+        因此本帧的预处理可以与上一帧的推理重叠。配合 result() 按提交顺序取结果：
+
+            detector.submit(frame0)
+            while running:
+                detector.submit(next_frame)
+                detections, infer_ms = detector.result()
+
+        未取走的结果最多保留 pipeline_depth 帧，超出时丢弃最旧的一帧，避免积压导致延迟越来越大
+        """
+        input_tensor, meta = self._preprocess(image)
+        if self._infer_pool is None:
+            self._infer_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="onnx-infer")
+        while len(self._pending) >= self.pipeline_depth:
+            self._pending.popleft().cancel()
+            log.debug("流水线积压，丢弃最旧的一帧")
+        self._pending.append(self._infer_pool.submit(self._infer, input_tensor, meta))
+
+    def result(self, timeout: Optional[float] = None) -> Optional[Tuple[List[Dict], float]]:
+        """取出最早提交的一帧的 (检测结果, 推理耗时 ms)，没有待取结果时返回 None"""
+        if not self._pending:
+            return None
+        return self._pending.popleft().result(timeout)
+
     def draw_detections(self, img: np.ndarray, detections: List[Dict]) -> np.ndarray:
         colors = [(0, 255, 0), (255, 0, 0), (0, 0, 255), (255, 255, 0), (0, 255, 255), (255, 0, 255)]
         for det in detections:
@@ -319,3 +498,62 @@ class YOLOONNXDetector:
         log.debug(f"Detected {len(detections)} objects:")
         for i, d in enumerate(detections):
             log.debug(f"  [{i+1}] {d['class_name']:15} {d['confidence']:.3f} {d['box']}")
+
+
+def quantized_model_path(model_path: Union[str, Path]) -> Path:
+    """量化模型的保存路径：best.onnx -> best.quant.onnx"""
+    model_path = Path(model_path)
+    return model_path.with_name(f"{model_path.stem}.quant.onnx")
+
+
+def quantize_model(
+    model_path: Union[str, Path],
+    calib_images: Optional[List[Union[str, Path]]] = None,
+    input_size: Tuple[int, int] = (640, 640),
+    output_path: Optional[Union[str, Path]] = None,
+) -> Path:
+    """
+    离线把 FP32 模型量化为 INT8，只需执行一次，之后 YOLOONNXDetector 会自动加载生成的 .quant.onnx
+    - 提供 calib_images 时做静态量化（QDQ，逐通道权重），用这些图片校准激活值范围，精度和速度最好
+    - 未提供时做动态量化，只量化权重
+    """
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, quantize_static
+
+    model_path = Path(model_path)
+    output_path = Path(output_path) if output_path else quantized_model_path(model_path)
+
+    if not calib_images:
+        quantize_dynamic(str(model_path), str(output_path), weight_type=QuantType.QInt8)
+        log.debug(f"Dynamic quantized model saved to {output_path}")
+        return output_path
+
+    # 校准时使用与推理完全相同的预处理
+    detector = YOLOONNXDetector(
+        model_path, class_names=[], input_size=input_size, providers=["CPUExecutionProvider"], prefer_quantized=False
+    )
+
+    class _CalibReader(CalibrationDataReader):
+        def __init__(self):
+            self._paths = iter(calib_images)
+
+        def get_next(self):
+            for path in self._paths:
+                img = cv2.imread(str(path))
+                if img is None:
+                    log.error(f"校准图片读取失败: {path}")
+                    continue
+                input_tensor, _ = detector._preprocess(img)
+                return {detector.input_name: input_tensor}
+            return None
+
+    quantize_static(
+        str(model_path),
+        str(output_path),
+        calibration_data_reader=_CalibReader(),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+    )
+    log.debug(f"Static quantized model saved to {output_path}")
+    return output_path
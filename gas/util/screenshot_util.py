@@ -1,19 +1,205 @@
 import ctypes
+import time
+from collections import OrderedDict
+from ctypes import wintypes
 
+import cv2
 import numpy as np
 import win32con
 import win32gui
 import win32ui
 
 from gas.logger import get_logger
+from gas.util.hwnd_util import get_client_rect
 
 logger = get_logger()
 
+_gdi32 = ctypes.WinDLL("gdi32", use_last_error=True)
+_user32 = ctypes.WinDLL("user32", use_last_error=True)
 
-def screenshot(hwnd, region: tuple[int, int, int, int] | None = None) -> np.ndarray:
-    """截图，返回只读BGR图片"""
+BI_RGB = 0
+DIB_RGB_COLORS = 0
+
+# 帧指纹采样像素数；画面指纹不变时复用上次灰度结果的最长时间（秒）
+FINGERPRINT_SAMPLES = 64
+FRAME_MAX_STALE = 0.5
+# 最多缓存多少个窗口的 DIB 帧，超出时淘汰最久未使用的
+MAX_DIB_FRAMES = 8
+
+
+class _BITMAPINFOHEADER(ctypes.Structure):
+    _fields_ = [
+        ("biSize", wintypes.DWORD),
+        ("biWidth", wintypes.LONG),
+        ("biHeight", wintypes.LONG),
+        ("biPlanes", wintypes.WORD),
+        ("biBitCount", wintypes.WORD),
+        ("biCompression", wintypes.DWORD),
+        ("biSizeImage", wintypes.DWORD),
+        ("biXPelsPerMeter", wintypes.LONG),
+        ("biYPelsPerMeter", wintypes.LONG),
+        ("biClrUsed", wintypes.DWORD),
+        ("biClrImportant", wintypes.DWORD),
+    ]
+
+
+class _BITMAPINFO(ctypes.Structure):
+    _fields_ = [("bmiHeader", _BITMAPINFOHEADER), ("bmiColors", wintypes.DWORD * 3)]
+
+
+_gdi32.CreateCompatibleDC.argtypes = [wintypes.HDC]
+_gdi32.CreateCompatibleDC.restype = wintypes.HDC
+_gdi32.CreateDIBSection.argtypes = [
+    wintypes.HDC,
+    ctypes.POINTER(_BITMAPINFO),
+    wintypes.UINT,
+    ctypes.POINTER(ctypes.c_void_p),
+    wintypes.HANDLE,
+    wintypes.DWORD,
+]
+_gdi32.CreateDIBSection.restype = wintypes.HBITMAP
+_gdi32.SelectObject.argtypes = [wintypes.HDC, wintypes.HGDIOBJ]
+_gdi32.SelectObject.restype = wintypes.HGDIOBJ
+_gdi32.DeleteObject.argtypes = [wintypes.HGDIOBJ]
+_gdi32.DeleteObject.restype = wintypes.BOOL
+_gdi32.DeleteDC.argtypes = [wintypes.HDC]
+_gdi32.DeleteDC.restype = wintypes.BOOL
+_gdi32.BitBlt.argtypes = [
+    wintypes.HDC,
+    ctypes.c_int,
+    ctypes.c_int,
+    ctypes.c_int,
+    ctypes.c_int,
+    wintypes.HDC,
+    ctypes.c_int,
+    ctypes.c_int,
+    wintypes.DWORD,
+]
+_gdi32.BitBlt.restype = wintypes.BOOL
+_user32.GetWindowDC.argtypes = [wintypes.HWND]
+_user32.GetWindowDC.restype = wintypes.HDC
+_user32.ReleaseDC.argtypes = [wintypes.HWND, wintypes.HDC]
+_user32.ReleaseDC.restype = ctypes.c_int
+_user32.IsWindow.argtypes = [wintypes.HWND]
+_user32.IsWindow.restype = wintypes.BOOL
+
+
+class _GdiHandles:
+    """DIB 段相关的 GDI 句柄，随最后一个引用像素内存的数组一起释放"""
+
+    def __init__(self, hdc, hbitmap, old_obj):
+        self.hdc = hdc
+        self.hbitmap = hbitmap
+        self.old_obj = old_obj
+
+    def __del__(self):
+        _gdi32.SelectObject(self.hdc, self.old_obj)
+        _gdi32.DeleteObject(self.hbitmap)
+        _gdi32.DeleteDC(self.hdc)
+
+
+class _DibFrame:
+    """
+    顶向下 32 位 DIB 段，BitBlt 直接写入其像素内存
+
+    像素内存只在创建时包装一次为 (H, W, 4) 的 numpy 视图，之后每帧零分配；
+    窗口尺寸变化时由调用方重建。
+    """
+
+    def __init__(self, width: int, height: int):
+        bmi = _BITMAPINFO()
+        header = bmi.bmiHeader
+        header.biSize = ctypes.sizeof(_BITMAPINFOHEADER)
+        header.biWidth = width
+        header.biHeight = -height  # 负高度 = 顶向下，行顺序与 numpy 一致
+        header.biPlanes = 1
+        header.biBitCount = 32
+        header.biCompression = BI_RGB
+
+        hdc = _gdi32.CreateCompatibleDC(None)
+        bits = ctypes.c_void_p()
+        hbitmap = _gdi32.CreateDIBSection(hdc, ctypes.byref(bmi), DIB_RGB_COLORS, ctypes.byref(bits), None, 0)
+        if not hbitmap:
+            _gdi32.DeleteDC(hdc)
+            raise ctypes.WinError(ctypes.get_last_error())
+        old_obj = _gdi32.SelectObject(hdc, hbitmap)
+
+        size = width * height * 4
+        pixels = (ctypes.c_ubyte * size).from_address(bits.value)
+        # 句柄挂在像素缓冲上：只要还有数组引用这块内存，DIB 就不会被释放
+        pixels.owner = _GdiHandles(hdc, hbitmap, old_obj)
+
+        self.hdc = hdc
+        self.shape = (height, width)
+        self.bgra = np.frombuffer(pixels, dtype=np.uint8, count=size).reshape((height, width, 4))
+        self.bgr = self.bgra[..., :3]
+        self.bgr.flags.writeable = False
+
+        # 按固定步长均匀采样的像素视图，用于廉价判断画面是否变化
+        flat = self.bgra.view(np.uint32).reshape(-1)
+        self._samples = flat[:: max(1, flat.size // FINGERPRINT_SAMPLES)][:FINGERPRINT_SAMPLES]
+        self._gray: np.ndarray | None = None
+        self._gray_fp = b""
+        self._gray_ts = 0.0
+
+    def to_gray(self) -> np.ndarray:
+        """
+        转换为灰度图（只读）
+
+        采样指纹与上次相同且未超过 FRAME_MAX_STALE 时直接返回上次结果，
+        静止画面（等待界面、菜单停留）不再重复做颜色转换
+        """
+        now = time.monotonic()
+        fp = self._samples.tobytes()
+        if self._gray is not None and fp == self._gray_fp and now - self._gray_ts < FRAME_MAX_STALE:
+            return self._gray
+
+        gray = cv2.cvtColor(self.bgra, cv2.COLOR_BGRA2GRAY)
+        gray.flags.writeable = False
+        self._gray = gray
+        self._gray_fp = fp
+        self._gray_ts = now
+        return gray
+
+
+# hwnd -> 复用的 DIB 帧，按最近使用排序
+# 移出缓存后 GDI 句柄随最后一个引用像素内存的数组释放（见 _GdiHandles）
+_dib_cache: "OrderedDict[int, _DibFrame]" = OrderedDict()
+
+
+def _evict_dib_frames():
+    """淘汰已销毁窗口的 DIB 帧，数量仍超过 MAX_DIB_FRAMES 时再淘汰最久未使用的"""
+    for hwnd in [h for h in _dib_cache if not _user32.IsWindow(h)]:
+        del _dib_cache[hwnd]
+    while len(_dib_cache) > MAX_DIB_FRAMES:
+        _dib_cache.popitem(last=False)
+
+
+def _get_dib_frame(hwnd, width: int, height: int) -> _DibFrame:
+    """获取窗口对应的 DIB 帧，尺寸变化时重建"""
+    dib = _dib_cache.get(hwnd)
+    if dib is None or dib.shape != (height, width):
+        dib = _DibFrame(width, height)
+        _dib_cache[hwnd] = dib
+        # 只在新建帧时清理，正常截图路径不做额外检查
+        _evict_dib_frames()
+    else:
+        _dib_cache.move_to_end(hwnd)
+    return dib
+
+
+def release_dib_frames(hwnd=None):
+    """释放缓存的 DIB 帧（hwnd 为 None 时全部释放），窗口关闭后可主动调用"""
+    if hwnd is None:
+        _dib_cache.clear()
+    else:
+        _dib_cache.pop(hwnd, None)
+
+
+def screenshot(hwnd, region: tuple[int, int, int, int] | None = None, copy: bool = False) -> np.ndarray:
+    """截图，返回只读BGR图片；copy=True 时返回可写的独立副本"""
     if region is None:
-        region = win32gui.GetClientRect(hwnd)
+        region = get_client_rect(hwnd)
     left, top, right, bottom = region
     width = right - left
     height = bottom - top
@@ -74,50 +260,42 @@ def screenshot(hwnd, region: tuple[int, int, int, int] | None = None) -> np.ndar
     mfc_dc.DeleteDC()
     win32gui.ReleaseDC(hwnd, hwnd_dc)
 
-    return img
+    return img.copy() if copy else img
 
 
-def screenshot_bitblt(hwnd, region: tuple[int, int, int, int] | None = None) -> np.ndarray:
+def screenshot_bitblt(
+    hwnd, region: tuple[int, int, int, int] | None = None, grayscale: bool = False, copy: bool = False
+) -> np.ndarray:
     """
     截取指定窗口的指定区域，并返回 BGR 格式的 `numpy.ndarray`
 
+    注意：默认返回的是该窗口复用 DIB 缓冲的只读视图，同一窗口的下一次截图会覆盖其内容；
+    需要跨帧保留结果（缓存 OCR 结果、对比前后帧等）时传 copy=True
+
     :param hwnd: 窗口句柄（int）
     :param region: (left, top, right, bottom) 截图区域
+    :param grayscale: 为 True 时直接由 BGRA 一次转换为只读灰度图，省去 BGR 中间结果；画面未变化时复用上次结果
+    :param copy: 为 True 时返回可写的独立副本，不受后续截图影响
     :return: 截取的 BGR 格式图像，`numpy.ndarray`
     """
     if region is None:
-        region = win32gui.GetClientRect(hwnd)
+        region = get_client_rect(hwnd)
     left, top, right, bottom = region
     width, height = right - left, bottom - top
 
-    # 获取窗口 DC（设备上下文）
-    hwnd_dc = win32gui.GetWindowDC(hwnd)
-    mfc_dc = win32ui.CreateDCFromHandle(hwnd_dc)
-    save_dc = mfc_dc.CreateCompatibleDC()
-
-    # 创建兼容位图（仅分配指定区域大小的内存）
-    save_bitmap = win32ui.CreateBitmap()
-    save_bitmap.CreateCompatibleBitmap(mfc_dc, width, height)
-    save_dc.SelectObject(save_bitmap)
-
-    # 直接拷贝指定区域到位图
-    save_dc.BitBlt((0, 0), (width, height), mfc_dc, (left, top), win32con.SRCCOPY)
+    dib = _get_dib_frame(hwnd, width, height)
 
-    # 提取位图数据（BGRA 格式）
-    bmpinfo = save_bitmap.GetInfo()
-    bmpstr = save_bitmap.GetBitmapBits(True)
-
-    # 转换为 numpy 数组
-    img = np.frombuffer(bmpstr, dtype=np.uint8)
-    img = img.reshape((bmpinfo["bmHeight"], bmpinfo["bmWidth"], 4))  # BGRA 格式（4通道）
-
-    # 释放资源
-    win32gui.DeleteObject(save_bitmap.GetHandle())
-    save_dc.DeleteDC()
-    mfc_dc.DeleteDC()
-    win32gui.ReleaseDC(hwnd, hwnd_dc)
+    # 直接拷贝指定区域到 DIB 像素内存（BGRA 格式）
+    hwnd_dc = _user32.GetWindowDC(hwnd)
+    try:
+        if not _gdi32.BitBlt(dib.hdc, 0, 0, width, height, hwnd_dc, left, top, win32con.SRCCOPY):
+            raise ctypes.WinError(ctypes.get_last_error())
+    finally:
+        _user32.ReleaseDC(hwnd, hwnd_dc)
 
-    # 去掉未使用的 Alpha 通道（BGRA → BGR）
-    img = img[:, :, :3]
+    if grayscale:
+        gray = dib.to_gray()
+        return gray.copy() if copy else gray
 
-    return img
+    # 去掉未使用的 Alpha 通道（BGRA → BGR），默认仅为视图不拷贝
+    return dib.bgr.copy() if copy else dib.bgr
@@ -0,0 +1,154 @@
+import ctypes
+import math
+import sys
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from ctypes import wintypes
+
+from gas.logger import get_logger
+
+logger = get_logger()
+
+# Windows 默认计时器精度约 15.6ms，time.sleep(0.005) 实际会睡到一个时钟周期
+if sys.platform == "win32":
+    _winmm = ctypes.WinDLL("winmm")
+    _winmm.timeBeginPeriod.argtypes = [ctypes.c_uint]
+    _winmm.timeBeginPeriod.restype = ctypes.c_uint
+    _winmm.timeEndPeriod.argtypes = [ctypes.c_uint]
+    _winmm.timeEndPeriod.restype = ctypes.c_uint
+
+    _kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    _kernel32.CreateWaitableTimerExW.argtypes = [wintypes.LPVOID, wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD]
+    _kernel32.CreateWaitableTimerExW.restype = wintypes.HANDLE
+    _kernel32.SetWaitableTimer.argtypes = [
+        wintypes.HANDLE,
+        ctypes.POINTER(wintypes.LARGE_INTEGER),
+        wintypes.LONG,
+        wintypes.LPVOID,
+        wintypes.LPVOID,
+        wintypes.BOOL,
+    ]
+    _kernel32.SetWaitableTimer.restype = wintypes.BOOL
+    _kernel32.WaitForSingleObject.argtypes = [wintypes.HANDLE, wintypes.DWORD]
+    _kernel32.WaitForSingleObject.restype = wintypes.DWORD
+    _kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+    _kernel32.CloseHandle.restype = wintypes.BOOL
+else:
+    _winmm = None
+    _kernel32 = None
+
+CREATE_WAITABLE_TIMER_HIGH_RESOLUTION = 0x00000002
+TIMER_ALL_ACCESS = 0x001F0003
+# Python 3.11 起 Windows 上的 time.sleep 本身就使用高精度可等待计时器
+_USE_WAITABLE_TIMER = _kernel32 is not None and sys.version_info < (3, 11)
+
+TIMERR_NOERROR = 0
+
+# 短于该值的等待直接自旋，time.sleep 即使在 1ms 计时精度下也做不到亚毫秒
+SPIN_THRESHOLD = 0.002
+# 较长等待最后留给自旋的时间
+SPIN_MARGIN = 0.001
+
+_period_lock = threading.Lock()
+_period_refs = 0
+
+
+def begin_high_resolution(period_ms: int = 1):
+    """提高系统计时器精度（引用计数），需与 end_high_resolution 成对调用；非 Windows 为空操作"""
+    global _period_refs
+    if _winmm is None:
+        return
+    with _period_lock:
+        if _period_refs == 0 and _winmm.timeBeginPeriod(period_ms) != TIMERR_NOERROR:
+            logger.warning("timeBeginPeriod(%d) 调用失败，sleep 精度保持系统默认", period_ms)
+        _period_refs += 1
+
+
+def end_high_resolution(period_ms: int = 1):
+    """撤销一次 begin_high_resolution，最后一次撤销时恢复系统默认精度"""
+    global _period_refs
+    if _winmm is None:
+        return
+    with _period_lock:
+        if _period_refs == 0:
+            return
+        _period_refs -= 1
+        if _period_refs == 0:
+            _winmm.timeEndPeriod(period_ms)
+
+
+@contextmanager
+def high_resolution_timer(period_ms: int = 1):
+    """在 with 块内把系统计时器精度提高到 period_ms 毫秒
+
+    仅 Windows 生效（timeBeginPeriod / timeEndPeriod），其他平台为空操作。
+    支持嵌套和多线程同时使用，按引用计数只在首次进入时设置、最后一次退出时恢复
+    """
+    begin_high_resolution(period_ms)
+    try:
+        yield
+    finally:
+        end_high_resolution(period_ms)
+
+
+_timer_local = threading.local()
+
+
+class _TimerHolder:
+    """持有线程的计时器句柄；线程退出时 threading.local 释放本对象，由 weakref.finalize 关闭句柄"""
+
+    __slots__ = ("handle", "__weakref__")
+
+    def __init__(self, handle):
+        self.handle = handle
+        if handle:
+            weakref.finalize(self, _kernel32.CloseHandle, handle)
+
+
+def _thread_timer():
+    """当前线程的可等待计时器句柄，优先高精度版本（Win10 1803+）；都创建失败时返回 None"""
+    holder = getattr(_timer_local, "holder", None)
+    if holder is None:
+        handle = _kernel32.CreateWaitableTimerExW(None, None, CREATE_WAITABLE_TIMER_HIGH_RESOLUTION, TIMER_ALL_ACCESS)
+        if not handle:
+            handle = _kernel32.CreateWaitableTimerExW(None, None, 0, TIMER_ALL_ACCESS)
+        if not handle:
+            logger.warning("CreateWaitableTimerExW 失败，回退到 time.sleep: %s", ctypes.WinError(ctypes.get_last_error()))
+        _timer_local.holder = holder = _TimerHolder(handle or None)
+    return holder.handle
+
+
+def _timer_sleep(seconds: float):
+    """用可等待计时器等待，精度 100ns 单位，不受系统时钟周期限制"""
+    handle = _thread_timer()
+    if handle is None:
+        time.sleep(seconds)
+        return
+    # 负数表示相对时间，单位 100ns
+    due = wintypes.LARGE_INTEGER(-int(seconds * 10_000_000))
+    if not _kernel32.SetWaitableTimer(handle, ctypes.byref(due), 0, None, None, False):
+        time.sleep(seconds)
+        return
+    # 有上限地等待：计时器未按预期触发时最多多等 1ms，不会无限期挂起
+    _kernel32.WaitForSingleObject(handle, math.ceil(seconds * 1000) + 1)
+
+
+def precise_sleep(seconds: float):
+    """
+    精确等待：先让出 CPU 睡到截止时间前 SPIN_MARGIN，再用 perf_counter 自旋到截止时间，
+    系统繁忙导致的唤醒延迟落在自旋窗口内，不会让等待超时；短于 SPIN_THRESHOLD 时全程自旋
+    """
+    if seconds <= 0.0:
+        return
+    perf_counter = time.perf_counter
+    deadline = perf_counter() + seconds
+    if seconds >= SPIN_THRESHOLD:
+        coarse = seconds - SPIN_MARGIN
+        if _USE_WAITABLE_TIMER:
+            _timer_sleep(coarse)
+        else:
+            time.sleep(coarse)
+    while perf_counter() < deadline:
+        pass
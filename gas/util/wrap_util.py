@@ -1,4 +1,6 @@
 import functools
+import logging
+import os
 from logging import Logger
 import time
 
@@ -8,34 +10,60 @@ from gas.logger import get_logger
 _func_stats = {}
 
 
-def timeit(_func=None, *, log: Logger = None, ignore: int = 0):
-    """耗时计时器，分别计算每个函数的平均耗时（跳过前 ignore 次调用）"""
+def _read_timeit_every(default: int = 30) -> int:
+    """读取环境变量 GAS_TIMEIT_EVERY，取值不是整数时使用默认值，避免导入本模块时抛异常"""
+    value = os.environ.get("GAS_TIMEIT_EVERY")
+    if value is None:
+        return default
+    try:
+        return max(1, int(value))
+    except ValueError:
+        get_logger().warning("GAS_TIMEIT_EVERY=%r 不是整数，使用默认值 %d", value, default)
+        return default
+
+
+# 默认每 N 次调用输出一次耗时日志，可通过环境变量 GAS_TIMEIT_EVERY 调整
+TIMEIT_EVERY = _read_timeit_every()
+
+
+def timeit(_func=None, *, log: Logger = None, ignore: int = 0, every: int | None = None):
+    """耗时计时器，分别计算每个函数的平均耗时（跳过前 ignore 次调用）
+
+    仅在日志开启 DEBUG 级别时计时，且每 every 次调用才输出一次（默认 TIMEIT_EVERY），
+    避免截图等高频调用每次都格式化并写日志
+    """
     log = log or get_logger()
+    every = max(1, every or TIMEIT_EVERY)
+    # 单调的纳秒整数计时，累加时不丢精度；绑定为局部名称省去每次调用的全局查找
+    perf_counter_ns = time.perf_counter_ns
+    is_enabled = log.isEnabledFor
 
     def decorator_timeit(func):
+        # 初始化当前函数的计时数据
+        stats = _func_stats.setdefault(func, {"count": 0, "total_time": 0.0})
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            # 初始化当前函数的计时数据
-            if func not in _func_stats:
-                _func_stats[func] = {"count": 0, "total_time": 0.0}
+            # 每次调用时检查级别（而非装饰时），运行中通过 update_level 调整级别也能生效
+            if not is_enabled(logging.DEBUG):
+                return func(*args, **kwargs)
 
-            stats = _func_stats[func]
-            start_time = time.perf_counter()
+            start_ns = perf_counter_ns()
             result = func(*args, **kwargs)
-            end_time = time.perf_counter()
-
-            elapsed_time = end_time - start_time
+            elapsed_time = (perf_counter_ns() - start_ns) / 1e9
             stats["count"] += 1
+            count = stats["count"]
 
             # 从第 ignore+1 次调用开始计算平均耗时
-            if stats["count"] > ignore:
+            if count > ignore:
                 stats["total_time"] += elapsed_time
-                avg_time = stats["total_time"] / (stats["count"] - ignore)
-                log.debug(
-                    f"{func.__name__} 耗时: {elapsed_time:.6f} 秒, 第 {stats['count']} 次调用平均耗时: {avg_time:.6f} 秒"
-                )
+                if (count - ignore) % every == 0:
+                    avg_time = stats["total_time"] / (count - ignore)
+                    log.debug(
+                        "%s 耗时: %.6f 秒, 第 %d 次调用平均耗时: %.6f 秒", func.__name__, elapsed_time, count, avg_time
+                    )
             else:
-                log.debug(f"{func.__name__} 耗时: {elapsed_time:.6f} 秒 (第{stats['count']}次不计入平均值)")
+                log.debug("%s 耗时: %.6f 秒 (第%d次不计入平均值)", func.__name__, elapsed_time, count)
             return result
 
         return wrapper
@@ -0,0 +1,124 @@
+import os
+import shutil
+import stat
+import threading
+
+import pytest
+
+from gas.providers.adb_provider import ADBProvider, _shell_quote
+
+pytestmark = pytest.mark.skipif(os.name == "nt" or shutil.which("sh") is None, reason="需要 POSIX sh 模拟设备端 shell")
+
+# 模拟 adb：version / devices 返回固定结果；shell 无参数时启动常驻 sh，有参数时与 adb 一样拼接后交给 sh -c
+FAKE_ADB = """#!/bin/sh
+case "$1" in
+    version) echo "Android Debug Bridge version 1.0.41"; exit 0 ;;
+    devices) printf 'List of devices attached\\nemulator-5554\\tdevice\\n'; exit 0 ;;
+esac
+while [ $# -gt 0 ] && [ "$1" != "shell" ]; do shift; done
+shift
+PATH="$FAKE_BIN:$PATH"
+export PATH
+if [ $# -eq 0 ]; then exec sh; fi
+exec sh -c "$*"
+"""
+
+# 模拟设备端 input：记录 input text 收到的参数，其他子命令（keyevent 等）直接成功
+FAKE_INPUT = """#!/bin/sh
+if [ "$1" = text ]; then printf '%s' "$2" > "$FAKE_OUT"; fi
+"""
+
+# 模拟 Clipper：记录 -e text 的值并返回 RESULT_OK
+FAKE_AM = """#!/bin/sh
+while [ $# -gt 0 ] && [ "$1" != "text" ]; do shift; done
+printf '%s' "$2" > "$FAKE_OUT"
+echo "Broadcast completed: result=-1"
+"""
+
+TEXTS = [
+    "it's",
+    'say "hi"',
+    "'\"",
+    "a; echo injected",
+    "f(x) && g(",
+    "line1\nline2",
+    "$HOME `id` \\ *",
+]
+
+
+def _write_script(path, content):
+    path.write_text(content)
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+
+
+@pytest.fixture
+def provider(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    _write_script(bin_dir / "input", FAKE_INPUT)
+    _write_script(bin_dir / "am", FAKE_AM)
+    adb = tmp_path / "adb"
+    _write_script(adb, FAKE_ADB)
+    monkeypatch.setenv("FAKE_BIN", str(bin_dir))
+    monkeypatch.setenv("FAKE_OUT", str(tmp_path / "out"))
+
+    p = ADBProvider(adb_path=str(adb))
+    yield p
+    p.close()
+
+
+def _recorded(tmp_path):
+    return (tmp_path / "out").read_text()
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_input_text_fallback_passes_text_verbatim(provider, tmp_path, text):
+    provider._clipper_available = False
+    assert provider.input_text(text)
+    assert _recorded(tmp_path) == text.replace(" ", "%s")
+
+    # 常驻 shell 没有被未闭合的引号卡住，哨兵仍能正常读到
+    result = provider._run_shell(["echo", "ok"], timeout=2)
+    assert (result.returncode, result.stdout) == (0, "ok\n")
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_paste_text_passes_text_verbatim(provider, tmp_path, text):
+    assert provider._paste_text(text)
+    assert _recorded(tmp_path) == text
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_shell_quote_round_trips_through_adb_shell(provider, tmp_path, text):
+    """不经过常驻 shell，直接以单独的 adb shell 进程执行时同样原样传递"""
+    result = provider._run_adb(["shell", "input", "text", _shell_quote(text)])
+    assert result.returncode == 0
+    assert _recorded(tmp_path) == text
+
+
+def test_concurrent_get_shell_starts_one_shell(provider):
+    barrier = threading.Barrier(8)
+    shells = []
+
+    def _worker():
+        barrier.wait()
+        shells.append(provider._get_shell())
+
+    threads = [threading.Thread(target=_worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len({id(s) for s in shells}) == 1
+
+
+def test_stale_reset_keeps_rebuilt_shell(provider):
+    old = provider._get_shell()
+    provider._reset_shell(shell=old)
+    new = provider._get_shell()
+    assert new is not old
+
+    # 另一个线程持有的旧 shell 出错后再丢弃，不影响已经重建的 shell
+    provider._reset_shell(shell=old)
+    assert provider._get_shell() is new
+    assert new.alive
@@ -0,0 +1,76 @@
+import pytest
+
+from gas.recorder.operation_player import OperationPlayer, ReplayConfig
+from gas.recorder.operation_recorder import OperationData
+
+
+def move(t: float, x: float = 0.5, y: float = 0.5) -> OperationData:
+    return OperationData(type="mouse", mouse_action="move", pos_x=x, pos_y=y, timestamp=t)
+
+
+def click(t: float, event: str) -> OperationData:
+    return OperationData(
+        type="mouse", mouse_action="click", mouse_button="left", mouse_event=event, pos_x=0.5, pos_y=0.5, timestamp=t
+    )
+
+
+@pytest.fixture
+def player():
+    # _coalesce_moves 不访问设备
+    return OperationPlayer(device_provider=None)
+
+
+def timestamps(ops):
+    return [op.timestamp for op in ops]
+
+
+def test_short_unpressed_run_keeps_last_sample(player):
+    ops = [move(0.000), move(0.005), move(0.010)]
+    assert player._coalesce_moves(ops) == [ops[-1]]
+
+
+def test_long_unpressed_run_is_capped_by_interval(player):
+    # 悬停 1 秒、每 5ms 一个采样：不能只剩最后一个，而是每个 16ms 窗口保留一个
+    ops = [move(i * 0.005) for i in range(201)]
+    result = player._coalesce_moves(ops)
+    assert 1 < len(result) < len(ops)
+    assert result[-1] is ops[-1]
+    gaps = [b - a for a, b in zip(timestamps(result), timestamps(result)[1:])]
+    assert max(gaps) <= player.config.move_coalesce_interval + 0.005 + 1e-9
+
+
+def test_interval_window_boundaries(player):
+    ops = [move(0.000), move(0.005), move(0.010), move(0.020), move(0.030)]
+    assert timestamps(player._coalesce_moves(ops)) == [0.010, 0.030]
+
+
+def test_pressed_run_is_capped_and_clicks_are_kept(player):
+    drag = [move(0.100 + i * 0.005) for i in range(41)]
+    ops = [click(0.0, "down"), *drag, click(0.400, "up")]
+    result = player._coalesce_moves(ops)
+    assert result[0] is ops[0]
+    assert result[-1] is ops[-1]
+    moves = result[1:-1]
+    assert 1 < len(moves) < len(drag)
+    assert moves[-1] is drag[-1]
+
+
+def test_pressed_and_unpressed_runs_use_same_rule(player):
+    hover = [move(i * 0.005) for i in range(41)]
+    drag = [move(1.0 + i * 0.005) for i in range(41)]
+    hover_result = player._coalesce_moves(hover)
+    drag_result = player._coalesce_moves([click(0.99, "down"), *drag, click(1.3, "up")])[1:-1]
+    assert len(hover_result) == len(drag_result)
+
+
+def test_non_move_operation_flushes_pending_move(player):
+    key = OperationData(type="keyboard", key="a", key_event="down", timestamp=0.006)
+    ops = [move(0.000), move(0.005), key, move(0.007)]
+    assert player._coalesce_moves(ops) == [ops[1], key, ops[3]]
+
+
+def test_disabled_returns_input_unchanged():
+    player = OperationPlayer(device_provider=None)
+    player.config = ReplayConfig(coalesce_moves=False)
+    ops = [move(0.000), move(0.005), move(0.010)]
+    assert player._coalesce_moves(ops) is ops
@@ -0,0 +1,140 @@
+import pytest
+
+from gas.recorder import operation_recorder
+from gas.recorder.operation_recorder import OperationData, OperationRecorder
+
+
+@pytest.fixture(params=["orjson", "json"])
+def json_backend(request, monkeypatch):
+    """分别在有 / 没有 orjson 的情况下运行"""
+    if request.param == "json":
+        monkeypatch.setattr(operation_recorder, "orjson", None)
+    elif operation_recorder.orjson is None:
+        pytest.skip("未安装 orjson")
+    return request.param
+
+
+def sample_recorder() -> OperationRecorder:
+    recorder = OperationRecorder(screen_width=1280, screen_height=720)
+    recorder.start_time = 1700000000.5
+    recorder.operations = [
+        OperationData(type="mouse", mouse_action="move", pos_x=0.25, pos_y=0.5, timestamp=0.0),
+        OperationData(
+            type="mouse",
+            mouse_action="click",
+            mouse_button="left",
+            mouse_event="down",
+            pos_x=0.25,
+            pos_y=0.5,
+            timestamp=0.1,
+        ),
+        OperationData(
+            type="mouse",
+            mouse_action="click",
+            mouse_button="left",
+            mouse_event="up",
+            pos_x=0.3,
+            pos_y=0.55,
+            timestamp=0.2,
+        ),
+        OperationData(type="mouse", mouse_action="scroll", pos_x=0.3, pos_y=0.55, scroll=-2, timestamp=0.3),
+        OperationData(type="keyboard", key="中", key_event="down", timestamp=0.4),
+        OperationData(type="keyboard", key="中", key_event="up", timestamp=0.45),
+    ]
+    return recorder
+
+
+def test_json_and_ndjson_round_trip_match(tmp_path, json_backend):
+    recorder = sample_recorder()
+    json_file = tmp_path / "ops.json"
+    ndjson_file = tmp_path / "ops.ndjson"
+    assert recorder.save_to_file(str(json_file))
+    assert recorder.save_to_file_ndjson(str(ndjson_file))
+
+    from_json = OperationRecorder()
+    from_ndjson = OperationRecorder()
+    assert from_json.load_from_file(str(json_file))
+    assert from_ndjson.load_from_file_ndjson(str(ndjson_file))
+
+    for loaded in (from_json, from_ndjson):
+        assert loaded.operations == recorder.operations
+        assert (loaded.screen_width, loaded.screen_height) == (1280, 720)
+        assert loaded.start_time == recorder.start_time
+
+
+def test_ndjson_header_is_first_line(tmp_path, json_backend):
+    ndjson_file = tmp_path / "ops.ndjson"
+    sample_recorder().save_to_file_ndjson(str(ndjson_file))
+    lines = ndjson_file.read_bytes().splitlines()
+    assert len(lines) == 1 + len(sample_recorder().operations)
+    assert b"screen_width" in lines[0]
+
+
+def test_ndjson_truncated_line_fails_cleanly(tmp_path, json_backend):
+    ndjson_file = tmp_path / "ops.ndjson"
+    sample_recorder().save_to_file_ndjson(str(ndjson_file))
+    data = ndjson_file.read_bytes()
+    # 模拟写入中途崩溃：最后一行只写了一半
+    ndjson_file.write_bytes(data[: len(data) - 20])
+
+    with pytest.raises(ValueError):
+        OperationRecorder._read_ndjson(str(ndjson_file))
+
+    recorder = OperationRecorder()
+    assert recorder.load_from_file_ndjson(str(ndjson_file)) is False
+    assert recorder.operations == []
+
+
+def test_ndjson_blank_lines_are_skipped(tmp_path, json_backend):
+    ndjson_file = tmp_path / "ops.ndjson"
+    sample_recorder().save_to_file_ndjson(str(ndjson_file))
+    ndjson_file.write_bytes(ndjson_file.read_bytes() + b"\n\n")
+    _, _, _, ops = OperationRecorder._read_ndjson(str(ndjson_file))
+    assert ops == sample_recorder().operations
+
+
+@pytest.mark.parametrize(
+    "op",
+    [
+        OperationData(type="mouse", mouse_action="move", pos_x=0.1, pos_y=0.2),
+        OperationData(type="mouse", mouse_action="click", mouse_button="right", mouse_event="up", pos_x=0, pos_y=0),
+        OperationData(type="mouse", mouse_action="scroll", scroll=1),
+        OperationData(type="keyboard", key="a", key_event="down"),
+    ],
+)
+def test_validate_accepts_complete_operations(op):
+    op.validate()
+
+
+@pytest.mark.parametrize(
+    "op",
+    [
+        OperationData(type="mouse"),
+        OperationData(type="mouse", mouse_action="click", mouse_event="down", pos_x=0.1, pos_y=0.1),
+        OperationData(type="mouse", mouse_action="click", mouse_button="left", pos_x=0.1, pos_y=0.1),
+        OperationData(type="mouse", mouse_action="move", pos_x=0.1),
+        OperationData(type="mouse", mouse_action="click", mouse_button="left", mouse_event="up", pos_y=0.1),
+        OperationData(type="keyboard", key="a"),
+        OperationData(type="keyboard", key_event="down"),
+    ],
+)
+def test_validate_rejects_incomplete_operations(op):
+    with pytest.raises(ValueError):
+        op.validate()
+
+
+def test_sequence_validate_reports_index():
+    ops = [
+        OperationData(type="keyboard", key="a", key_event="down"),
+        OperationData(type="mouse", mouse_action="move"),
+    ]
+    with pytest.raises(ValueError, match="第 2 个操作"):
+        OperationRecorder.validate(ops)
+
+
+def test_load_rejects_invalid_operation(tmp_path, json_backend):
+    recorder = sample_recorder()
+    recorder.operations.append(OperationData(type="keyboard", key="a", timestamp=0.5))
+    json_file = tmp_path / "ops.json"
+    assert recorder.save_to_file(str(json_file))
+    assert OperationRecorder().load_from_file(str(json_file)) is False
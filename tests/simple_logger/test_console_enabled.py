@@ -0,0 +1,22 @@
+import io
+import sys
+
+from gas.simple_logger.core import console_enabled
+
+
+def test_disabled_without_stdout(monkeypatch):
+    monkeypatch.delenv("GAS_LOG_CONSOLE", raising=False)
+    monkeypatch.setattr(sys, "stdout", None)
+    assert console_enabled() is False
+
+
+def test_enabled_when_redirected(monkeypatch):
+    monkeypatch.delenv("GAS_LOG_CONSOLE", raising=False)
+    monkeypatch.setattr(sys, "stdout", io.StringIO())
+    assert console_enabled() is True
+
+
+def test_env_opt_out(monkeypatch):
+    monkeypatch.setenv("GAS_LOG_CONSOLE", "0")
+    monkeypatch.setattr(sys, "stdout", io.StringIO())
+    assert console_enabled() is False
@@ -0,0 +1,99 @@
+import logging
+import os
+
+import pytest
+
+from gas.simple_logger import handlers as handlers_module
+from gas.simple_logger.handlers import TimestampRotatingFileHandler
+
+RECORD_BYTES = 100  # 每条日志 99 个字符 + 换行
+
+
+def make_record(level: int = logging.INFO, char: str = "x") -> logging.LogRecord:
+    return logging.LogRecord("test", level, __file__, 1, char * (RECORD_BYTES - 1), None, None)
+
+
+@pytest.fixture
+def make_handler(tmp_path):
+    handlers = []
+
+    def factory(**kwargs):
+        kwargs.setdefault("flush_bytes", 1 << 20)  # 足够大，除非主动刷盘否则都留在缓冲里
+        handler = TimestampRotatingFileHandler(str(tmp_path / "app.log"), encoding="utf-8", **kwargs)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        # 从后台定时刷盘中移除，缓冲内容只由测试控制，断言不受刷盘线程时机影响
+        handlers_module._buffered_handlers.discard(handler)
+        handlers.append(handler)
+        return handler
+
+    yield factory
+    for handler in handlers:
+        handler.close()
+
+
+def backups(tmp_path):
+    return sorted(p for p in tmp_path.iterdir() if p.name.startswith("app_"))
+
+
+def test_error_record_is_written_immediately(tmp_path, make_handler):
+    handler = make_handler()
+    handler.emit(make_record(logging.ERROR, "e"))
+    # 不调用 flush，ERROR 也必须已经落盘
+    assert (tmp_path / "app.log").read_bytes() == b"e" * (RECORD_BYTES - 1) + b"\n"
+    assert not handler._buf
+
+
+def test_info_record_is_written_on_flush(tmp_path, make_handler):
+    handler = make_handler()
+    handler.emit(make_record(logging.INFO, "i"))
+    handler.flush()
+    assert (tmp_path / "app.log").read_bytes() == b"i" * (RECORD_BYTES - 1) + b"\n"
+
+
+def test_rollover_counts_buffered_bytes(tmp_path, make_handler):
+    handler = make_handler(maxBytes=10 * RECORD_BYTES, backupCount=3)
+
+    # 前 9 条全部在缓冲区里：文件仍为空，但 文件 + 缓冲 已达 900 字节
+    for _ in range(9):
+        handler.emit(make_record())
+    assert os.path.getsize(tmp_path / "app.log") == 0
+    assert len(handler._buf) == 9 * RECORD_BYTES
+    assert backups(tmp_path) == []
+
+    # 第 10 条会让 文件 + 缓冲 达到 maxBytes，写入前先轮转，缓冲随备份文件一起落盘
+    handler.emit(make_record())
+    files = backups(tmp_path)
+    assert len(files) == 1
+    assert files[0].stat().st_size == 9 * RECORD_BYTES
+    assert len(handler._buf) == RECORD_BYTES
+
+    handler.flush()
+    assert os.path.getsize(tmp_path / "app.log") == RECORD_BYTES
+
+
+def test_rollover_counts_flushed_and_buffered_bytes(tmp_path, make_handler):
+    handler = make_handler(maxBytes=10 * RECORD_BYTES, backupCount=3)
+    for _ in range(5):
+        handler.emit(make_record())
+    handler.flush()  # 500 字节已在文件中
+    for _ in range(4):
+        handler.emit(make_record())  # 400 字节在缓冲中
+    assert backups(tmp_path) == []
+
+    handler.emit(make_record())
+    files = backups(tmp_path)
+    assert len(files) == 1
+    assert files[0].stat().st_size == 9 * RECORD_BYTES
+
+
+def test_rollover_keeps_backup_count(tmp_path, make_handler):
+    handler = make_handler(maxBytes=10 * RECORD_BYTES, backupCount=2)
+    # 预先放几个较早时间戳的备份，轮转后只保留最新的 backupCount 个
+    for stamp in ("2000-01-01_00-00-00", "2000-01-02_00-00-00", "2000-01-03_00-00-00"):
+        (tmp_path / f"app_{stamp}.log").write_bytes(b"old")
+    for _ in range(10):
+        handler.emit(make_record())
+
+    names = [p.name for p in backups(tmp_path)]
+    assert len(names) == 2
+    assert "app_2000-01-03_00-00-00.log" in names
@@ -0,0 +1,54 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+
+from gas.util import onnx_util
+
+BOXES = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [20, 20, 30, 30], [40, 40, 50, 50]], dtype=np.float32)
+SCORES = np.array([0.9, 0.8, 0.7, 0.1], dtype=np.float32)
+# cv2.dnn.NMSBoxes 的结果：1 与 0 重叠被抑制，3 低于分数阈值
+CV2_KEEP = [0, 2]
+
+
+@pytest.fixture
+def reset_torch_nms(monkeypatch):
+    monkeypatch.setattr(onnx_util, "_torch_nms", None)
+    monkeypatch.setattr(onnx_util, "_torch_nms_checked", False)
+
+
+def test_import_failure_falls_back(reset_torch_nms, monkeypatch):
+    """torch 导入时抛出 OSError（如 DLL 加载失败）也回退到 OpenCV"""
+    broken = types.ModuleType("torchvision.ops")
+
+    def _getattr(name):
+        raise OSError("DLL load failed")
+
+    broken.__getattr__ = _getattr
+    monkeypatch.setitem(sys.modules, "torch", types.ModuleType("torch"))
+    monkeypatch.setitem(sys.modules, "torchvision", types.ModuleType("torchvision"))
+    monkeypatch.setitem(sys.modules, "torchvision.ops", broken)
+
+    keep = onnx_util.nms_xyxy(BOXES, SCORES, 0.5, 0.25)
+    assert keep.tolist() == CV2_KEEP
+    assert onnx_util._torch_nms is None
+
+
+def test_call_failure_falls_back_and_disables_torch(monkeypatch):
+    calls = []
+
+    def _failing_nms(boxes, scores, iou):
+        calls.append(1)
+        raise RuntimeError("Could not run 'torchvision::nms'")
+
+    monkeypatch.setattr(onnx_util, "_torch_nms", _failing_nms)
+    monkeypatch.setattr(onnx_util, "_torch_nms_checked", True)
+
+    assert onnx_util.nms_xyxy(BOXES, SCORES, 0.5, 0.25).tolist() == CV2_KEEP
+    assert onnx_util.nms_xyxy(BOXES, SCORES, 0.5, 0.25).tolist() == CV2_KEEP
+    # 只尝试一次，之后直接走 OpenCV
+    assert len(calls) == 1
+    assert onnx_util._torch_nms is None
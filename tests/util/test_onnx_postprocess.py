@@ -0,0 +1,144 @@
+import cv2
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+
+from gas.util.onnx_util import YOLOONNXDetector
+
+CLASS_NAMES = ["a", "b", "c"]
+
+
+def _detector(conf_threshold=0.25, iou_threshold=0.45, input_size=(640, 640)):
+    """不加载模型，只设置后处理和 letterbox 用到的属性"""
+    detector = YOLOONNXDetector.__new__(YOLOONNXDetector)
+    detector.conf_threshold = conf_threshold
+    detector.iou_threshold = iou_threshold
+    detector.input_width, detector.input_height = input_size
+    detector.class_names = CLASS_NAMES
+    detector._lb_cache = {}
+    return detector
+
+
+def _reference_letterbox(img, new_shape, color=(114, 114, 114)):
+    """缓存前的 letterbox 实现"""
+    shape = img.shape[:2]
+    r = min(new_shape[1] / shape[1], new_shape[0] / shape[0])
+    new_unpad = int(round(shape[1] * r)), int(round(shape[0] * r))
+    dw, dh = new_shape[1] - new_unpad[0], new_shape[0] - new_unpad[1]
+    dw /= 2
+    dh /= 2
+    if shape[::-1] != new_unpad:
+        img = cv2.resize(img, new_unpad, interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+    return img, r, (dw, dh)
+
+
+def _reference_postprocess(detector, preds, meta):
+    """向量化前逐框组装结果的后处理实现"""
+    pred = preds[0][0].transpose(1, 0)
+    boxes = pred[:, :4]
+    scores = pred[:, 4:]
+    class_conf = np.max(scores, axis=1)
+    class_ids = np.argmax(scores, axis=1)
+    mask = class_conf > detector.conf_threshold
+    if not np.any(mask):
+        return []
+    boxes = boxes[mask]
+    class_conf = class_conf[mask]
+    class_ids = class_ids[mask]
+
+    x, y, w, h = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    ratio = meta["ratio"]
+    dw, dh = meta["pad"]
+    x1 = (x - w / 2 - dw) / ratio
+    y1 = (y - h / 2 - dh) / ratio
+    x2 = (x + w / 2 - dw) / ratio
+    y2 = (y + h / 2 - dh) / ratio
+
+    nms_boxes = np.stack([x1, y1, x2 - x1, y2 - y1], axis=1).tolist()
+    indices = cv2.dnn.NMSBoxes(
+        bboxes=nms_boxes,
+        scores=class_conf.tolist(),
+        score_threshold=detector.conf_threshold,
+        nms_threshold=detector.iou_threshold,
+    )
+    if len(indices) == 0:
+        return []
+    indices = np.array(indices).flatten()
+
+    detections = []
+    orig_h, orig_w = meta["original_shape"]
+    for i in indices:
+        cls_id = int(class_ids[i])
+        box = [
+            max(0, int(x1[i])),
+            max(0, int(y1[i])),
+            min(orig_w, int(x2[i])),
+            min(orig_h, int(y2[i])),
+        ]
+        detections.append(
+            {
+                "box": box,
+                "confidence": float(class_conf[i]),
+                "class_id": cls_id,
+                "class_name": detector.class_names[cls_id] if cls_id < len(detector.class_names) else f"class_{cls_id}",
+                "center": ((box[0] + box[2]) // 2, (box[1] + box[3]) // 2),
+            }
+        )
+    return detections
+
+
+def _fixed_preds(num_boxes=200, num_classes=4, seed=0):
+    """固定随机种子生成 (1, 4 + nc, N) 的模型输出，包含重叠框、越界框和超出类别名数量的类别"""
+    rng = np.random.default_rng(seed)
+    cx = rng.uniform(0, 640, num_boxes)
+    cy = rng.uniform(80, 560, num_boxes)
+    w = rng.uniform(5, 120, num_boxes)
+    h = rng.uniform(5, 120, num_boxes)
+    scores = rng.uniform(0, 1, (num_boxes, num_classes)) ** 3
+    pred = np.concatenate([np.stack([cx, cy, w, h], axis=1), scores], axis=1).astype(np.float32)
+    return [pred.T[None].copy()]
+
+
+@pytest.mark.parametrize("shape", [(480, 640), (720, 1280), (640, 640), (333, 517)])
+def test_letterbox_matches_reference(shape):
+    detector = _detector()
+    img = np.random.default_rng(1).integers(0, 256, (*shape, 3), dtype=np.uint8)
+    expected_img, expected_r, expected_pad = _reference_letterbox(img, (640, 640))
+
+    # 第二次调用命中参数缓存，结果应与首次一致
+    for _ in range(2):
+        out, r, pad = detector._letterbox(img, (640, 640))
+        assert r == expected_r
+        assert pad == expected_pad
+        assert np.array_equal(out, expected_img)
+    assert len(detector._lb_cache) == 1
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_postprocess_matches_reference(seed):
+    detector = _detector()
+    preds = _fixed_preds(seed=seed)
+    _, r, pad = detector._letterbox(np.zeros((720, 1280, 3), dtype=np.uint8), (640, 640))
+    meta = {"original_shape": (720, 1280), "resized_shape": (640, 640), "ratio": r, "pad": pad}
+
+    expected = _reference_postprocess(detector, preds, meta)
+    detections = detector._postprocess(preds, meta)
+
+    assert expected
+    assert [d["box"] for d in detections] == [d["box"] for d in expected]
+    assert [d["confidence"] for d in detections] == pytest.approx([d["confidence"] for d in expected])
+    assert [(d["class_id"], d["class_name"], d["center"]) for d in detections] == [
+        (d["class_id"], d["class_name"], d["center"]) for d in expected
+    ]
+
+
+def test_postprocess_no_candidates():
+    detector = _detector(conf_threshold=0.99)
+    preds = _fixed_preds()
+    preds[0][0, 4:] *= 0.5
+    meta = {"original_shape": (640, 640), "resized_shape": (640, 640), "ratio": 1.0, "pad": (0.0, 0.0)}
+    assert detector._postprocess(preds, meta) == []